@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""blog manager benchmarks"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import typing
+from collections import Counter
+from timeit import default_timer as code_timer
+from warnings import filterwarnings as filter_warnings
+
+import blog
+
+BENCHMARKS: dict[str, typing.Callable[[typing.List[str]], int]] = {}
+
+
+def benchmark(
+    fn: typing.Callable[[typing.List[str]], int],
+) -> typing.Callable[[typing.List[str]], int]:
+    BENCHMARKS[fn.__name__.replace("_", "-")] = fn
+    return fn
+
+
+def best(fn: typing.Callable[[], typing.Any], runs: int = 5) -> float:
+    """best wall time of `runs` calls of `fn`"""
+
+    times: typing.List[float] = []
+
+    for _ in range(runs):
+        ct: float = code_timer()
+        fn()
+        times.append(code_timer() - ct)
+
+    return min(times)
+
+
+def synthetic_blog(posts: int, seed: int = 0) -> dict[str, typing.Any]:
+    """a blog like `blog.json` with `posts` posts of random words"""
+
+    rnd: random.Random = random.Random(seed)
+    words: typing.List[str] = [
+        "".join(
+            rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(1, 12))
+        )
+        for _ in range(5000)
+    ] + ["ąčęėįšųūž", "π", "😀"]
+
+    def text(n: int) -> str:
+        return " ".join(rnd.choices(words, k=n))
+
+    config: dict[str, typing.Any] = blog.DEFAULT_CONFIG.copy()
+    config["posts"] = {
+        f"post-{idx}": {
+            "title": text(6),
+            "description": text(20),
+            "content": "\n\n".join(text(60) for _ in range(rnd.randint(2, 12))),
+            "keywords": rnd.sample(words, 6),
+            "created": 1600000000 + idx * 3600 + rnd.random(),
+            **({"edited": 1700000000 + rnd.random()} if idx % 3 == 0 else {}),
+        }
+        for idx in range(posts)
+    }
+
+    return config
+
+
+@benchmark
+def codec(args: typing.List[str]) -> int:
+    """load and dump a synthetic blog.json, `json` vs the blog codec"""
+
+    config: dict[str, typing.Any] = synthetic_blog(int(args[0]) if args else 10000)
+    indent: int = config["indent"]
+
+    compact: bytes = json.dumps(config).encode()
+    indented: bytes = json.dumps(config, indent=indent).encode()
+
+    assert blog.json_loads(indented) == blog.json_loads(compact) == json.loads(compact)
+    assert blog.json_dumps(config) == compact
+    assert blog.json_dumps(config, indent) == indented
+
+    print(
+        f"{len(config['posts'])} posts, {len(indented)} B indented, {len(compact)} B compact, "
+        f"orjson {'' if blog.optional_orjson() else 'not '}installed\n"
+    )
+
+    for name, stdlib, codec in (
+        ("load", lambda: json.loads(indented), lambda: blog.json_loads(indented)),
+        (
+            "dump indent",
+            lambda: json.dumps(config, indent=indent).encode(),
+            lambda: blog.json_dumps(config, indent),
+        ),
+        (
+            "dump compact",
+            lambda: json.dumps(config).encode(),
+            lambda: blog.json_dumps(config),
+        ),
+    ):
+        st: float = best(stdlib)
+        ct: float = best(codec)
+        print(
+            f"{name:<14} json {st * 1000:8.2f} ms   codec {ct * 1000:8.2f} ms   {st / ct:5.2f}x"
+        )
+
+    if blog.optional_orjson() is not None:
+        print(
+            f"\nplain orjson dump ( not byte compatible ) {best(lambda: blog.optional_orjson().dumps(config)) * 1000:.2f} ms"
+        )
+
+    return 0
+
+
+# children forked from the benchmark would inherit its peak rss, so they are
+# started from a small launcher which reports theirs
+
+LAUNCHER: typing.Final[str] = """
+import resource, subprocess, sys
+subprocess.run(sys.argv[1:])
+print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def run_child(
+    cmd: typing.List[str], cwd: str, marker: str
+) -> typing.Tuple[float | None, float, int]:
+    """time to the first line logged after a line containing `marker`, total \
+time and peak rss in KiB of running `cmd`"""
+
+    env: typing.Dict[str, str] = {**os.environ, "NOCLR": "1"}
+    env.pop("CI", None)
+
+    ct: float = code_timer()
+    proc: subprocess.Popen[bytes] = subprocess.Popen(
+        [sys.executable, "-c", LAUNCHER, *cmd],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    first: float | None = None
+    seen: bool = False
+
+    for line in proc.stderr:  # type: ignore
+        if seen and first is None:
+            first = code_timer() - ct
+
+        seen = seen or marker.encode() in line
+
+    rss: bytes = proc.stdout.read()  # type: ignore
+    total: float = code_timer() - ct
+
+    proc.wait()
+    proc.stdout.close()  # type: ignore
+    proc.stderr.close()  # type: ignore
+
+    return first, total, int(rss)
+
+
+STREAM_SNIPPETS: typing.Final[typing.Dict[str, str]] = {
+    "load": """
+import sys, blog
+print("start", file=sys.stderr)
+posts = blog.PostStore(blog.JsonStore("blog.json").load()["posts"])
+for slug, post in posts.items():
+    print(slug, len(post.content), file=sys.stderr)
+""",
+    "stream": """
+import sys, blog
+print("start", file=sys.stderr)
+for event in blog.JsonStore("blog.json").stream():
+    if event.post:
+        print(event.key, len(event.value.content), file=sys.stderr)
+""",
+}
+
+
+@benchmark
+def stream(args: typing.List[str]) -> int:
+    """time to first output and peak rss of reading a large blog.json, \
+loading it whole vs streaming it, and of the streamed commands"""
+
+    config: dict[str, typing.Any] = synthetic_blog(int(args[0]) if args else 10000)
+    scripts: str = os.path.dirname(os.path.abspath(blog.__file__))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(f"{tmp}/blog.json", "wb") as fp:
+            fp.write(blog.json_dumps(config, config["indent"]))
+
+        print(
+            f"{len(config['posts'])} posts, {os.path.getsize(f'{tmp}/blog.json')} B\n"
+        )
+
+        for name, cmd, marker in (
+            *(
+                (
+                    name,
+                    [
+                        sys.executable,
+                        "-c",
+                        f"import sys; sys.path.insert(0, {scripts!r})\n{code}",
+                    ],
+                    "start",
+                )
+                for name, code in STREAM_SNIPPETS.items()
+            ),
+            *(
+                (cmd, [sys.executable, blog.__file__, cmd], "calling and timing")
+                for cmd in ("help", "ls")
+            ),
+        ):
+            first, total, rss = run_child(cmd, tmp, marker)
+            print(
+                f"{name:<8} first output {'-' if first is None else f'{first * 1000:.2f} ms':>11}   "
+                f"total {total * 1000:9.2f} ms   peak rss {rss / 1024:8.1f} MiB"
+            )
+
+    return 0
+
+
+def zipf_words(vocab: int) -> typing.Tuple[typing.List[str], typing.List[float]]:
+    """a `vocab` word vocabulary and its cumulative zipf weights"""
+
+    return [f"word{idx}" for idx in range(vocab)], list(
+        itertools.accumulate(1 / (idx + 1) ** 1.1 for idx in range(vocab))
+    )
+
+
+def word_stream(
+    posts: int,
+    vocab: typing.Tuple[typing.List[str], typing.List[float]],
+    seed: int = 0,
+) -> typing.Iterator[blog.BuildStats]:
+    """exactly counted stats of `posts` posts of words picked from `vocab`, \
+each post also has a few words used nowhere else, like urls or code"""
+
+    rnd: random.Random = random.Random(seed)
+    words, weights = vocab
+
+    for post in range(posts):
+        stats: blog.BuildStats = blog.BuildStats()
+
+        stats.words.update(
+            rnd.choices(words, cum_weights=weights, k=rnd.randint(200, 2000))
+        )
+        stats.words.update(f"https://{post}.example.com/{idx}" for idx in range(50))
+        stats.word_count = sum(stats.words.values())
+
+        yield stats
+
+
+@benchmark
+def top_words(args: typing.List[str]) -> int:
+    """accuracy, peak memory and time of counting words exactly vs with \
+`TopWords`, `top_words [posts] [vocabulary] [error]`, the vocabulary is made \
+before memory is traced"""
+
+    posts: int = int(args[0]) if len(args) > 0 else 5000
+    vocab: typing.Tuple[typing.List[str], typing.List[float]] = zipf_words(
+        int(args[1]) if len(args) > 1 else 200000
+    )
+    error: float = float(args[2]) if len(args) > 2 else 0.0001
+    top: int = blog.DEFAULT_CONFIG["top-words"]
+
+    def fold(exact_words: int | None) -> blog.BuildStats:
+        stats: blog.BuildStats = blog.BuildStats(exact_words, error)
+
+        for post in word_stream(posts, vocab):
+            stats.merge(post)
+
+        return stats
+
+    results: typing.Dict[str, typing.Tuple[blog.BuildStats, float, int]] = {}
+
+    for name, exact_words in ("exact", None), ("approx", 0):
+        ct: float = code_timer()
+        fold(exact_words)
+        took: float = code_timer() - ct
+
+        tracemalloc.start()
+        stats: blog.BuildStats = fold(exact_words)
+        peak: int = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = stats, took, peak
+
+    exact: Counter[str] = results["exact"][0].words
+    approx: blog.BuildStats = results["approx"][0]
+    counts, distinct = approx.word_counts()
+
+    real: typing.Dict[str, int] = dict(blog.most_common(exact, top))
+    found: typing.Dict[str, int] = dict(blog.most_common(counts, top))
+
+    print(
+        f"{posts} posts, {approx.word_count} words, {len(exact)} distinct, "
+        f"{approx.top.size} counters\n"  # type: ignore
+    )
+
+    for name, (_, took, peak) in results.items():
+        print(f"{name:<7} {took * 1000:9.2f} ms   peak {peak / 1024 / 1024:8.2f} MiB")
+
+    print(
+        f"\ntop {top} found : {len(real.keys() & found.keys())}, "
+        f"most over : {max(found[w] - exact[w] for w in found)} "
+        f"( bound {approx.top.error}, {approx.word_count * error:.0f} at most ), "  # type: ignore
+        f"distinct estimate : {distinct} ( {(distinct / len(exact) - 1) * 100:+.2f}% )"
+    )
+
+    return 0
+
+
+# most time spent importing modules allowed for each command, in milliseconds,
+# interactive commands stop at their first prompt as stdin is empty
+
+IMPORT_BUDGETS: typing.Final[typing.Dict[str, float]] = {
+    "help": 60,
+    "ls": 60,
+    "search": 60,
+    "new": 70,
+    "ed": 90,
+    "rm": 90,
+    "robots": 70,
+    "manifest": 70,
+    "sitemap": 90,
+    "rss": 90,
+    "apis": 70,
+    "css": 100,
+    "stats": 80,
+    "build": 300,
+}
+
+
+def import_times(cmd: typing.List[str], cwd: str) -> typing.Dict[str, float]:
+    """milliseconds spent importing each top level module while running `cmd`"""
+
+    env: typing.Dict[str, str] = {**os.environ, "NOCLR": "1"}
+    env.pop("CI", None)
+
+    proc: subprocess.CompletedProcess[str] = subprocess.run(
+        [sys.executable, "-X", "importtime", *cmd],
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=60,
+    )
+    times: typing.Dict[str, float] = {}
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[12:].split("|")
+
+        if not name.startswith("  "):  # nested imports count towards their parent
+            times[name.strip()] = int(cumulative) / 1000
+
+    return times
+
+
+@benchmark
+def import_profile(args: typing.List[str]) -> int:
+    """time spent importing modules by each command, checked against \
+`IMPORT_BUDGETS`, `import_profile [runs] [commands...]`"""
+
+    runs: int = int(args[0]) if args else 5
+    cmds: typing.List[str] = args[1:] or list(IMPORT_BUDGETS)
+    code: int = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config: dict[str, typing.Any] = synthetic_blog(50)
+
+        with open(f"{tmp}/blog.json", "wb") as fp:
+            fp.write(blog.json_dumps(config, config["indent"]))
+
+        for cmd in cmds:
+            runs_times: typing.List[typing.Dict[str, float]] = [
+                import_times([blog.__file__, cmd], tmp) for _ in range(runs)
+            ]
+            times: typing.Dict[str, float] = min(
+                runs_times, key=lambda times: sum(times.values())
+            )
+            total: float = sum(times.values())
+            budget: float = IMPORT_BUDGETS.get(cmd, float("inf"))
+
+            if over := total > budget:
+                code = 1
+
+            print(
+                f"{cmd:<10} {total:7.2f} ms / {budget:5.0f} ms {'OVER' if over else 'ok  '}   "
+                + ", ".join(
+                    f"{name} {ms:.1f}"
+                    for name, ms in sorted(times.items(), key=lambda kv: -kv[1])[:4]
+                )
+            )
+
+    return code
+
+
+def main() -> int:
+    """entry / main function"""
+
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(
+            "usage : bench.py <benchmark> [args...]\n\n"
+            + "\n".join(f"{name} -- {fn.__doc__}" for name, fn in BENCHMARKS.items()),
+            file=sys.stderr,
+        )
+        return 1
+
+    return BENCHMARKS[sys.argv[1]](sys.argv[2:])
+
+
+if __name__ == "__main__":
+    assert (
+        main.__annotations__.get("return") == "int"
+    ), "main() should return an integer"
+
+    filter_warnings("error", category=Warning)
+    raise SystemExit(main())
@@ -4,43 +4,111 @@
 
 from __future__ import annotations
 
+import abc
+import bisect
+import codecs
 import datetime
+import functools
 import hashlib
+import heapq
 import json
+import math
 import os
 import re
 import shutil
 import string
-import subprocess
 import sys
 import tempfile
+import time
 import typing
-import xml.etree.ElementTree as etree
-from collections import Counter
+from collections import Counter, deque
 from glob import iglob
 from html import escape as html_escape
-from threading import Thread
+from threading import Lock, local
 from timeit import default_timer as code_timer
 from warnings import filterwarnings as filter_warnings
 
-import mistune
-import mistune.core
-import mistune.inline_parser
-import mistune.plugins
-import unidecode
-import web_mini
-from readtime import of_markdown as read_time_of_markdown  # type: ignore
-from readtime.result import Result as MarkdownResult  # type: ignore
+# anything else is imported by the commands which need it, so `help` or `ls`
+# do not pay for the markdown stack, see `bench.py import-profile`
+
+if typing.TYPE_CHECKING:
+    import sqlite3
+    from concurrent.futures import Executor, Future
+
+    import mistune
+    import mistune.core
+    import mistune.inline_parser
 
 __version__: typing.Final[int] = 2
 GEN: typing.Final[str] = f"ari-web blog generator version {__version__}"
 
 
+T = typing.TypeVar("T")
+K = typing.TypeVar("K")
+
 OK: typing.Final[int] = 0
 ER: typing.Final[int] = 1
 
 CONFIG_FILE: typing.Final[str] = "blog.json"
-DEFAULT_CONFIG: dict[str, typing.Any] = {
+STORE_DIR: typing.Final[str] = "blog.d"
+DB_FILE: typing.Final[str] = "blog.db"
+# next to the site it is published into, as publishing renames across it
+STAGE_DIR: typing.Final[str] = ".blog-stage"
+Theme = typing.TypedDict(
+    "Theme",
+    {
+        "primary": str,
+        "secondary": str,
+        "type": str,
+    },
+)
+Config = typing.TypedDict(
+    "Config",
+    {
+        "title": str,
+        "header": str,
+        "description": str,
+        "posts-dir": str,
+        "assets-dir": str,
+        "rss-file": str,
+        "blog-keywords": typing.List[str],
+        "default-keywords": typing.List[str],
+        "website": str,
+        "blog": str,
+        "source": str,
+        "visitor-count": str,
+        "comment": str,
+        "theme": Theme,
+        "manifest": typing.Dict[str, typing.Any],
+        "author": str,
+        "email": str,
+        "locale": str,
+        "recents": int,
+        "indent": int,
+        "markdown-plugins": typing.List[str],
+        "editor": typing.List[str],
+        "context-words": typing.List[str],
+        "wslug-limit": int,
+        "slug-limit": int,
+        "license": str,
+        "recent-title-trunc": int,
+        "server-host": str,
+        "server-port": int,
+        "post-preview-size": int,
+        "read-wpm": int,
+        "top-words": int,
+        "top-tags": int,
+        "cache-dir": str,
+        "workers": typing.Optional[int],
+        "render-cache-size": int,
+        "render-cache-age": int,
+        "exact-words": typing.Optional[int],
+        "top-words-error": float,
+        "posts": typing.Any,
+    },
+)
+
+DEFAULT_CONFIG: Config = {
     "title": "blog",
     "header": "blog",
     "description": "my blog page",
@@ -141,9 +209,50 @@ DEFAULT_CONFIG: dict[str, typing.Any] = {
     "read-wpm": 150,
     "top-words": 64,
     "top-tags": 64,
+    "cache-dir": ".blog-cache",
+    "workers": None,
+    "render-cache-size": 64 * 1024 * 1024,
+    "render-cache-age": 30 * 24 * 60 * 60,
+    "exact-words": 100000,
+    "top-words-error": 0.0001,
     "posts": {},
 }
 
+# smallest and largest values of numeric config keys
+CONFIG_LIMITS: typing.Final[typing.Dict[str, typing.Tuple[float, float | None]]] = {
+    "recents": (1, None),
+    "indent": (0, None),
+    "wslug-limit": (1, None),
+    "slug-limit": (1, None),
+    "recent-title-trunc": (1, None),
+    "server-port": (0, 65535),
+    "post-preview-size": (0, None),
+    "read-wpm": (1, None),
+    "top-words": (0, None),
+    "top-tags": (0, None),
+    "workers": (1, None),
+    "render-cache-size": (0, None),
+    "render-cache-age": (0, None),
+    "exact-words": (1, None),
+    "top-words-error": (0.000001, 1),
+}
+# integer command line options, checked like the config keys they stand in for
+CLI_LIMITS: typing.Final[typing.Dict[str, typing.Tuple[float, float | None]]] = {
+    "--workers": CONFIG_LIMITS["workers"],
+    "--jobs": CONFIG_LIMITS["workers"],
+}
+LOCALE_RE: typing.Final[re.Pattern[str]] = re.compile(r"[a-z]{2}(?:_[A-Z]{2})?")
+DATE_RE: typing.Final[re.Pattern[str]] = re.compile(r"(\d{4})(?:-(0?[1-9]|1[0-2]))?")
+
+# config keys `build_post` reads itself, the rest of the config reaches a post
+# through the bound post template, which is hashed as a whole, see `build`
+POST_CONFIG_KEYS: typing.Final[typing.Tuple[str, ...]] = (
+    "posts-dir",
+    "default-keywords",
+    "markdown-plugins",
+    "read-wpm",
+)
+
 NCI: bool = "CI" not in os.environ
 NOCLR: bool = "NOCLR" in os.environ
 
@@ -152,6 +261,8 @@ ERR_CLR: str = "\033[1m\033[31m"
 NEW_CLR: str = "\033[1m\033[32m"
 IMP_CLR: str = "\033[1m\033[35m"
 
+# page templates, bodies are rendered after `HTML_BEGIN`, see `site_templates`
+
 HTML_BEGIN: typing.Final[
     str
 ] = """<!DOCTYPE html>
@@ -206,9 +317,7 @@ html{{background-color:var(--b);color:var(--f)}}{critical_css}
 <meta name="license" content="{license}">
 <link rel="sitemap" href="/sitemap.xml" type="application/xml">"""
 
-POST_TEMPLATE: typing.Final[str] = (
-    HTML_BEGIN
-    + """
+POST_TEMPLATE: typing.Final[str] = """
 <style type="text/css">{post_critical_css}</style>
 <title>{blog_title} -> {post_title}</title>
 <meta name="description" content="{post_title} by {author} at {post_creation_time} GMT -- {post_description}" />
@@ -257,11 +366,8 @@ POST_TEMPLATE: typing.Final[str] = (
 <footer><p>{author} &lt;<a href="mailto:{email}">{email}</a>&gt; + {license}</p></footer>
 </body>
 </html>"""
-)
 
-INDEX_TEMPLATE: typing.Final[str] = (
-    HTML_BEGIN
-    + """
+INDEX_TEMPLATE: typing.Final[str] = """
 <title>{blog_title}</title>
 <meta name="description" content="{blog_description}" />
 <meta property="og:type" content="website" />
@@ -304,11 +410,8 @@ INDEX_TEMPLATE: typing.Final[str] = (
 <footer><p>{author} &lt;<a href="mailto:{email}">{email}</a>&gt; + {license}</p></footer>
 </body>
 </html>"""
-)
 
-STATS_TEMPLATE: typing.Final[str] = (
-    HTML_BEGIN
-    + """
+STATS_TEMPLATE: typing.Final[str] = """
 <title>{blog_title} -> stats</title>
 <meta name="description" content="stats of {blog_title}, {blog_description}" />
 <meta property="og:type" content="website" />
@@ -406,39 +509,99 @@ STATS_TEMPLATE: typing.Final[str] = (
  </article>
 </main> <footer><p>{author} &lt;<a href="mailto:{email}">{email}</a>&gt; + {license}</p></footer> </body>
 </html>"""
-)
-
-if NCI:
-    import http.server
-
-    import pyfzf  # type: ignore
-else:
-    pyfzf: typing.Any = None
-    http: typing.Any = None
 
 
-class Commands:
+class Commands(typing.Generic[T]):
     def __init__(self) -> None:
-        self.commands: dict[str, typing.Callable[[dict[str, typing.Any]], int]] = {}
+        self.commands: dict[str, typing.Callable[[T], int]] = {}
 
-    def new(
-        self, fn: typing.Callable[[dict[str, typing.Any]], int]
-    ) -> typing.Callable[[dict[str, typing.Any]], int]:
-        self.commands[fn.__name__] = fn
+    def new(self, fn: typing.Callable[[T], int]) -> typing.Callable[[T], int]:
+        self.commands[fn.__name__.replace("_", "-")] = fn
         return fn
 
-    def __getitem__(self, name: str) -> typing.Callable[[dict[str, typing.Any]], int]:
+    def __getitem__(self, name: str) -> typing.Callable[[T], int]:
         return self.commands[name]
 
 
-cmds: Commands = Commands()
-ecmds: Commands = Commands()
+class PostEdit(typing.NamedTuple):
+    slug: str
+    post: Post
+    editor: typing.List[str]
+
+
+cmds: Commands[Config] = Commands()
+ecmds: Commands[PostEdit] = Commands()
 
 
 def ctimer() -> float:
     return code_timer() if NCI else 0
 
 
+def cli_arg(name: str) -> str | None:
+    for idx, arg in enumerate(sys.argv[2:], 2):
+        if arg == name and idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+
+    return None
+
+
+def cli_int(name: str) -> int | None:
+    return None if (value := cli_arg(name)) is None else int(value)
+
+
+def cli_errors() -> typing.List[str]:
+    """everything wrong with the integer command line options"""
+
+    errors: typing.List[str] = []
+
+    for name, limits in CLI_LIMITS.items():
+        if (value := cli_arg(name)) is None:
+            continue
+
+        try:
+            number: int = int(value)
+        except ValueError:
+            errors.append(f"{name} should be an integer, not {value!r}")
+            continue
+
+        if (error := limit_error(name, number, limits)) is not None:
+            errors.append(error)
+
+    return errors
+
+
+def worker_count(config: Config) -> int:
+    return cli_int("--workers") or config["workers"] or os.cpu_count() or 1
+
+
+def pmap(
+    executor: Executor,
+    fn: typing.Callable[..., T],
+    *iterables: typing.Iterable[typing.Any],
+    limit: int,
+) -> typing.Iterator[T]:
+    """map `fn` over `iterables` in `executor`, yielding results in order \
+with at most `limit` tasks in flight, raising the first failure"""
+
+    pending: typing.Deque[Future[T]] = deque()
+
+    try:
+        for args in zip(*iterables):
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+
+            pending.append(executor.submit(fn, *args))
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
 def log(msg: str, clr: str = LOG_CLR) -> int:
     if NCI:
         print(
@@ -468,9 +631,157 @@ def imp(msg: str) -> int:
     return log(msg, IMP_CLR)
 
 
+# config
+
+
+def type_errors(value: typing.Any, hint: typing.Any, path: str) -> typing.Iterator[str]:
+    """what makes `value` not match the type `hint`"""
+
+    origin: typing.Any = typing.get_origin(hint)
+    args: typing.Tuple[typing.Any, ...] = typing.get_args(hint)
+
+    if hint is typing.Any:
+        return
+
+    if isinstance(getattr(hint, "__total__", None), bool):  # a `typing.TypedDict`
+        if not isinstance(value, dict):
+            yield f"{path} should be an object"
+            return
+
+        for key, sub in typing.get_type_hints(hint).items():
+            if key in value:
+                yield from type_errors(value[key], sub, f"{path}.{key}")
+            else:
+                yield f"{path}.{key} is missing"
+    elif origin is typing.Union:
+        if all(any(type_errors(value, arg, path)) for arg in args):
+            yield f"{path} should be one of {', '.join(map(type_name, args))}"
+    elif origin is list:
+        if not isinstance(value, list):
+            yield f"{path} should be a list"
+            return
+
+        for idx, item in enumerate(typing.cast(typing.List[typing.Any], value)):
+            yield from type_errors(item, args[0], f"{path}[{idx}]")
+    elif origin is dict:
+        if not isinstance(value, dict):
+            yield f"{path} should be an object"
+            return
+
+        for key, item in typing.cast(typing.Dict[str, typing.Any], value).items():
+            yield from type_errors(item, args[1], f"{path}.{key}")
+    elif (
+        isinstance(value, bool)
+        and hint is not bool
+        or not isinstance(value, (int, float) if hint is float else hint)
+    ):
+        yield f"{path} should be {type_name(hint)}, not {type_name(type(value))}"
+
+
+def type_name(hint: typing.Any) -> str:
+    return "null" if hint is type(None) else getattr(hint, "__name__", str(hint))
+
+
+def limit_error(
+    name: str, value: float, limits: typing.Tuple[float, float | None]
+) -> str | None:
+    low, high = limits
+
+    if low <= value and (high is None or value <= high):
+        return None
+
+    return (
+        f"{name} should be at least {low}"
+        + ("" if high is None else f" and at most {high}")
+        + f", not {value}"
+    )
+
+
+def config_errors(config: Config) -> typing.List[str]:
+    """everything wrong with `config`, checked before any command runs"""
+
+    errors: typing.List[str] = [
+        error.lstrip(".") for error in type_errors(config, Config, "")
+    ]
+
+    if errors:
+        return errors
+
+    for key, limits in CONFIG_LIMITS.items():
+        value: float | None = typing.cast(typing.Mapping[str, typing.Any], config)[key]
+
+        if value is not None and (error := limit_error(key, value, limits)) is not None:
+            errors.append(error)
+
+    if not LOCALE_RE.fullmatch(config["locale"]):
+        errors.append(f"locale should look like 'en_GB', not {config['locale']!r}")
+
+    return errors
+
+
+def markdown_errors(plugins: typing.Iterable[str]) -> typing.List[str]:
+    """markdown plugins which cannot be loaded, checked before rendering \
+instead of with the rest of the config so other commands skip importing mistune"""
+
+    import mistune.plugins
+
+    errors: typing.List[str] = []
+
+    for plugin in plugins:
+        try:
+            mistune.plugins.import_plugin(plugin)  # type: ignore
+        except Exception as e:
+            errors.append(f"markdown plugin {plugin!r} cannot be loaded : {e}")
+
+    return errors
+
+
+class Derived(typing.NamedTuple):
+    """values derived from a checked config, computed once per run"""
+
+    title: str
+    description: str
+    header: str
+    author: str
+    blog_keywords: str
+    default_keywords: typing.Tuple[str, ...]
+    lang: str
+    language: str
+    styles: str
+    context_words: typing.FrozenSet[str]
+    wslug_limit: int
+    slug_limit: int
+
+    @classmethod
+    def of(cls, config: Config) -> Derived:
+        return cls(
+            html_escape(config["title"]),
+            html_escape(config["description"]),
+            html_escape(config["header"]),
+            html_escape(config["author"]),
+            html_escape(", ".join(config["blog-keywords"])),
+            tuple(config["default-keywords"]),
+            config["locale"][:2],
+            config["locale"].lower().replace("_", "-"),
+            f"{config['assets-dir']}/styles.min.css",
+            frozenset(config["context-words"]),
+            config["wslug-limit"],
+            config["slug-limit"],
+        )
+
+
+derived: Derived = Derived.of(DEFAULT_CONFIG)
+
+
+def unidecode(text: str) -> str:
+    import unidecode
+
+    return unidecode.unidecode(text)
+
+
 def slugify(
     title: str,
-    context_words: typing.Sequence[str] | None = None,
+    context_words: typing.Collection[str] | None = None,
     wslug_limit: int = DEFAULT_CONFIG["wslug-limit"],
     slug_limit: int = DEFAULT_CONFIG["slug-limit"],
 ) -> str:
@@ -479,22 +790,15 @@ def slugify(
             [
                 w
                 for w in "".join(
-                    c
-                    for c in unidecode.unidecode(title).lower()
-                    if c not in string.punctuation
+                    c for c in unidecode(title).lower() if c not in string.punctuation
                 ).split()
-                if w not in (context_words or [])
+                if w not in (context_words or ())
             ][:wslug_limit]
         )[:slug_limit].strip("-")
         or "post"
     )
 
 
-def rf_format_time(ts: float) -> typing.Tuple[datetime.datetime, str]:
-    d: datetime.datetime = datetime.datetime.utcfromtimestamp(ts)
-    return d, d.strftime("%Y-%m-%d %H:%M:%S")
-
-
 def rformat_time(ts: float) -> str:
     return datetime.datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
 
@@ -507,19 +811,21 @@ def select_multi(options: typing.Sequence[str]) -> list[str]:
     if not options:
         return []
 
-    return pyfzf.FzfPrompt().prompt(
+    import pyfzf  # type: ignore
+
+    return pyfzf.FzfPrompt().prompt(  # type: ignore
         choices=options,
         fzf_options="-m",
     )
 
 
-def select_posts(posts: dict[str, dict[str, typing.Any]]) -> tuple[str, ...]:
+def select_posts(posts: typing.Mapping[str, Post]) -> tuple[str, ...]:
     return tuple(
         map(
             lambda opt: opt.split("|", maxsplit=1)[0].strip(),
             select_multi(
                 tuple(
-                    f"{slug} | {post['title']} | {post['description']}"
+                    f"{slug} | {post.title} | {post.description}"
                     for slug, post in posts.items()
                 ),
             ),
@@ -528,12 +834,13 @@ def select_posts(posts: dict[str, dict[str, typing.Any]]) -> tuple[str, ...]:
 
 
 if NCI:
-    try:
-        import readline
-    except Exception:
-        readline: typing.Any = None
 
     def iinput(prompt: str, default_text: str = "", force: bool = True) -> str:
+        try:
+            import readline
+        except Exception:
+            readline: typing.Any = None
+
         default_text = default_text.strip()
 
         if readline is not None and default_text:
@@ -569,6 +876,8 @@ def get_tmpfile(name: str) -> str:
 
 
 def open_file(editor: typing.Sequence[str], path: str) -> None:
+    import subprocess
+
     log(f"formatting and running {editor!r} with {path!r}")
 
     try:
@@ -592,585 +901,2773 @@ def read_post(path: str) -> str:
         return ""
 
 
-def min_css_file(file: str, out: str) -> None:
-    with open(file, "r") as icss:
-        with open(out, "w") as ocss:
-            ocss.write(web_mini.css.minify_css(icss.read()))
-
-
-def sorted_post_counter(
-    c: Counter[int],
-    pcount: int,
-    fix: str,
-) -> typing.Dict[str, typing.Any]:
-    s: int = sum(c.values())
-    avg: float = s / len(c)
+# json
 
-    return {
-        f"posts_by_{fix}": " ".join(
-            f"<li><time>{v}</time> -- <code>{p}</code> post{'' if p == 1 else 's'}, <code>{p / pcount * 100:.2f}%</code></li>"
-            for v, p in c.most_common()
-        ),
-        f"posts_by_{fix}_avg": f"<code>{round(avg, 2)}</code>, <code>{round(avg / s * 100, 2)}%</code>",
-    }
 
+@functools.lru_cache(None)
+def optional_orjson() -> typing.Any:
+    """the orjson module, or None if it is not installed"""
 
-def s_to_str(seconds: float) -> str:
-    minutes, sec = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    days, hours = divmod(hours, 24)
+    try:
+        import orjson  # type: ignore
+    except ImportError:
+        return None
 
-    periods: typing.Tuple[typing.Tuple[float, str, str], ...] = (
-        (round(days, 2), "day", "days"),
-        (round(hours, 2), "hour", "hours"),
-        (round(minutes, 2), "minute", "minutes"),
-        (round(sec, 2), "second", "seconds"),
-    )
+    return orjson
 
-    time_periods: typing.List[str] = []
 
-    for period in periods:
-        if period[0] != 0:
-            time_periods.append(
-                "{} {}".format(period[0], period[1] if period[0] == 1 else period[2])
-            )
+def json_loads(data: str | bytes) -> typing.Any:
+    if (orjson := optional_orjson()) is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # NaN, infinities and huge integers are only parsed by `json`
 
-    readable_text: str = ", ".join(time_periods[:-1])
+    return json.loads(data)
 
-    if len(time_periods) > 1:
-        readable_text += " and " + time_periods[-1]
-    else:
-        readable_text = time_periods[0]
 
-    return (
-        f"{readable_text} ( {round(seconds, 2)} second{'' if seconds == 1 else 's'} )"
-    )
+def json_dumps(obj: typing.Any, indent: int | None = None) -> bytes:
+    """serialize `obj` exactly like `json.dumps` does, orjson output differs \
+( separators, indentation, escaping ) and converting it costs more than it saves"""
 
+    return json.dumps(obj, indent=indent).encode()
 
-# markdown
 
-TITLE_LINKS_RE: typing.Final[str] = r"<#:[^>]+?>"
+JSON_WS_RE: typing.Final[re.Pattern[str]] = re.compile(r"[ \t\n\r]*")
 
 
-def parse_inline_titlelink(
-    _: mistune.inline_parser.InlineParser,
-    m: re.Match[str],
-    state: mistune.core.InlineState,
-) -> int:
-    text: str = m.group(0)[3:-1]
+class JsonReader:
+    """incremental reader of a json document, values are decoded one at a time \
+as soon as enough of the file was read for them, without reading all of it"""
 
-    state.append_token(
-        {
-            "type": "link",
-            "children": [{"type": "text", "raw": f"# {text}"}],
-            "attrs": {"url": f"#{slugify(text, [], 768, 768)}"},
-        }
+    __slots__: typing.Tuple[str, ...] = (
+        "fp",
+        "chunk",
+        "text",
+        "json",
+        "buf",
+        "pos",
+        "eof",
     )
 
-    return m.end()
+    def __init__(self, fp: typing.BinaryIO, chunk: int = 1 << 16) -> None:
+        self.fp: typing.BinaryIO = fp
+        self.chunk: int = chunk
+        self.text: codecs.IncrementalDecoder = codecs.getincrementaldecoder("utf-8")()
+        self.json: json.JSONDecoder = json.JSONDecoder()
+        self.buf: str = ""
+        self.pos: int = 0
+        self.eof: bool = False
 
+    def fill(self) -> bool:
+        """read more of the file, dropping what was already decoded, reads grow \
+with the buffer so values larger than a chunk take few retries"""
 
-def titlelink(md: mistune.Markdown) -> None:
-    md.inline.register("titlelink", TITLE_LINKS_RE, parse_inline_titlelink, before="link")  # type: ignore
+        if self.eof:
+            return False
 
+        pos: int = self.pos
+        data: bytes = self.fp.read(max(self.chunk, len(self.buf) - pos))
+        self.eof = not data
+        self.buf = self.buf[pos:] + self.text.decode(data, self.eof)
+        self.pos = 0
 
-class BlogRenderer(mistune.HTMLRenderer):
-    def heading(self, text: str, level: int, **_: typing.Any) -> str:
-        slug: str = slugify(text, [], 768, 768)
-        level = max(2, level)
+        return True
 
-        return f'<h{level} id="{slug}" h><a href="#{slug}">#</a> {text}</h{level}>'
+    def peek(self) -> str:
+        """next character which is not whitespace, empty at the end of the file"""
 
+        while True:
+            self.pos = JSON_WS_RE.match(self.buf, self.pos).end()  # type: ignore
 
-def markdown(md: str, plugins: list[typing.Any]) -> str:
-    return mistune.create_markdown(plugins=plugins + [titlelink], renderer=BlogRenderer())(md)  # type: ignore
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
 
+            if not self.fill():
+                return ""
 
-# edit commands
+    def expect(self, chars: str) -> str:
+        if not (char := self.peek()) or char not in chars:
+            raise ValueError(
+                f"expected one of {chars!r}, got {char or 'end of file'!r} "
+                f"in {getattr(self.fp, 'name', 'json')!r}"
+            )
 
+        self.pos += 1
+        return char
 
-@ecmds.new
-def title(post: dict[str, typing.Any]) -> int:
-    post["title"] = iinput("post title", post["title"])
-    return OK
+    def value(self) -> typing.Any:
+        self.peek()
 
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
 
-@ecmds.new
-def description(post: dict[str, typing.Any]) -> int:
-    post["description"] = iinput("post description", post["description"])
-    return OK
+                raise
 
+            # a number at the end of the buffer might go on in the next chunk
+            if end < len(self.buf) or not self.fill():
+                self.pos = end
+                return value
 
-@ecmds.new
-def content(post: dict[str, typing.Any]) -> int:
-    """edit posts"""
+    def members(self) -> typing.Iterator[str]:
+        """keys of the object at the current position, each key's value has to \
+be read before the next key"""
 
-    log("getting post markdown path")
-    path: str = get_tmpfile(post["slug"])
+        self.expect("{")
 
-    log("writing content")
-    with open(path, "w") as p:
-        p.write(post["content"])
+        if self.peek() == "}":
+            self.pos += 1
+            return
 
-    open_file(post["editor"], path)
+        while True:
+            if self.peek() != '"':
+                self.expect('"')
 
-    if not (content := read_post(path)):
-        return err("post content cannot be empty")
+            key: str = self.value()
+            self.expect(":")
 
-    post["content"] = content
+            yield key
 
-    return OK
+            if self.expect(",}") == "}":
+                return
 
 
-@ecmds.new
-def keywords(post: dict[str, typing.Any]) -> int:
-    """edit keywords"""
+def hash_data(*data: typing.Any) -> str:
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
 
-    post["keywords"] = tuple(
-        map(
-            lambda k: unidecode.unidecode(k.strip()),
-            filter(
-                bool,
-                set(
-                    iinput("post keywords", ", ".join(post["keywords"]), force=False)
-                    .lower()
-                    .split(",")
-                ),
-            ),
-        )
+
+def hash_post(site: str, post: Post) -> str:
+    return hash_data(
+        site,
+        post.title,
+        post.description,
+        post.content,
+        post.keywords,
+        post.created,
+        post.edited,
     )
-    return OK
 
 
-# normal commands
+def load_manifest(path: str, **empty: typing.Any) -> dict[str, typing.Any]:
+    """the versioned cache file at `path`, or one made of `empty` if it is \
+missing, broken or from another version"""
 
+    try:
+        with open(path, "rb") as fp:
+            manifest: dict[str, typing.Any] = json_loads(fp.read())
 
-@cmds.new
-def help(_: dict[str, typing.Any]) -> int:
-    """print help"""
+        if manifest.get("version") == __version__:
+            return manifest
+    except Exception:
+        pass
 
-    return llog(
-        "\n\n"
-        + "\n".join(
-            f"{cmd} -- {fn.__doc__ or 'no help provided'}"
-            for cmd, fn in cmds.commands.items()
-        )
-    )
+    return {"version": __version__, **empty}
 
 
-@cmds.new
-def sort(config: dict[str, typing.Any]) -> int:
-    """sort blog posts by creation time"""
+def write_atomic(path: str, data: bytes) -> None:
+    """replace `path` with `data` in a single rename, a crash leaves either \
+the old or the new file in place, never a truncated one"""
 
-    log("sorting posts by creation time")
+    with open(tmp := f"{path}.tmp", "wb") as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
 
-    config["posts"] = dict(
-        map(
-            lambda k: (k, config["posts"][k]),
-            sorted(
-                config["posts"],
-                key=lambda k: config["posts"][k]["created"],
-                reverse=True,
-            ),
-        )
-    )
+    os.replace(tmp, path)
 
-    return lnew("sorted blog posts by creation time")
 
+def append_lines(path: str, lines: typing.Iterable[bytes]) -> None:
+    """append `lines` to the file at `path` and flush them to disk, a line \
+left unfinished by a crash is ended first so it cannot swallow the new ones"""
 
-@cmds.new
-def new(config: dict[str, typing.Any]) -> int:
-    """create a new blog post"""
+    data: bytes = b"".join(line + b"\n" for line in lines)
 
-    title: str = iinput("post title")
+    with open(path, "a+b") as fp:
+        if (end := fp.seek(0, os.SEEK_END)) > 0:
+            fp.seek(end - 1)
 
-    log("creating a slug from the given title")
-    slug: str = slugify(
-        title,
-        config["context-words"],
-        config["wslug-limit"],
-        config["slug-limit"],
-    )
+            if fp.read(1) != b"\n":
+                data = b"\n" + data
 
-    if slug in (posts := config["posts"]):
-        slug += f"-{sum(map(lambda k: k.startswith(slug), posts))}"
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
 
-    log("getting post markdown path")
-    post_path: str = get_tmpfile(slug)
 
-    open_file(config["editor"], post_path)
+def save_manifest(path: str, manifest: dict[str, typing.Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, json_dumps(manifest))
 
-    if not (content := read_post(post_path)):
-        return err("content cannot be empty")
 
-    keywords: tuple[str, ...] = tuple(
-        map(
-            lambda k: unidecode.unidecode(k.strip()),
-            filter(
-                bool,
-                set(
-                    iinput("post keywords ( separated by `,` )", force=False)
-                    .lower()
-                    .split(",")
-                ),
-            ),
-        )
-    )
+def link_file(src: str, dst: str) -> None:
+    """put `src` at `dst` without rewriting it, keeping its inode and mtime"""
 
-    description: str = iinput("post description")
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
-    lnew(f"saving blog post {slug!r}")
 
-    posts[slug] = {
-        "title": title,
-        "description": description.strip(),
-        "content": content,
-        "keywords": keywords,
-        "created": datetime.datetime.utcnow().timestamp(),
-    }
+def same_content(path: str, data: bytes) -> bool:
+    """does the file at `path` already hold exactly `data`"""
 
-    return OK
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+
+        with open(path, "rb") as fp:
+            return fp.read() == data
+    except OSError:
+        return False
+
+
+class Output:
+    """stages the output of commands and publishes it all at once, \
+if anything fails the live site is left untouched"""
+
+    __slots__: typing.Tuple[str, ...] = (
+        "root",
+        "claimed",
+        "hooks",
+        "written",
+        "unchanged",
+        "lock",
+    )
 
+    def __init__(self, root: str) -> None:
+        self.root: str = root
+        self.claimed: typing.Set[str] = set()
+        self.hooks: typing.List[typing.Callable[[], typing.Any]] = []
+        self.written: int = 0
+        self.unchanged: int = 0
+        self.lock: Lock = Lock()
 
-@cmds.new
-def ls(config: dict[str, typing.Any]) -> int:
-    """list all posts"""
+        self.discard()
+        os.makedirs(root)
 
-    for slug, post in reversed(config["posts"].items()):
-        llog(
-            f"""post({slug})
+    def path(self, path: str) -> str:
+        """staged location of the file at `path`"""
 
-title : {post["title"]!r}
-description : {post["description"]!r}
-content : {trunc(post["content"], config["post-preview-size"])!r}
-keywords : {", ".join(post["keywords"])}
-created : {format_time(post["created"])}"""
-            + (
-                ""
-                if (ed := post.get("edited")) is None
-                else f"\nedited : {format_time(ed)}"
-            )
-        )
+        staged: str = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        return staged
 
-    return OK
+    def is_claimed(self, path: str) -> bool:
+        path = os.path.normpath(path)
+        return any(path.startswith(f"{claimed}{os.sep}") for claimed in self.claimed)
 
+    def count(self, written: bool) -> None:
+        with self.lock:
+            if written:
+                self.written += 1
+            else:
+                self.unchanged += 1
 
-@cmds.new
-def ed(config: dict[str, typing.Any]) -> int:
-    """edit posts"""
+    def write(self, path: str, data: typing.Union[str, bytes]) -> bool:
+        """stage `data` for `path` unless the live file already holds it, \
+unchanged files keep their inode and mtime, returns if anything was written"""
 
-    fields: list[str] = select_multi(tuple(ecmds.commands.keys()))
+        if isinstance(data, str):
+            data = data.encode()
 
-    for slug in select_posts(config["posts"]):
-        llog(f"editing {slug!r}")
+        if written := not same_content(path, data):
+            with open(self.path(path), "wb") as fp:
+                fp.write(data)
+        elif self.is_claimed(path):
+            link_file(path, self.path(path))
 
-        for field in fields:
-            log(f"editing field {field!r}")
+        self.count(written)
+        return written
 
-            post: dict[str, typing.Any] = config["posts"][slug]
+    def claim(self, path: str) -> str:
+        """stage the directory at `path` as a whole, it replaces the live one \
+on publish instead of being merged into it"""
 
-            post["slug"] = slug
-            post["editor"] = config["editor"]
+        self.claimed.add(os.path.normpath(path))
+        os.makedirs(staged := os.path.join(self.root, path), exist_ok=True)
+        return staged
 
-            code: int = ecmds[field](post)
+    def on_publish(self, hook: typing.Callable[[], typing.Any]) -> None:
+        self.hooks.append(hook)
 
-            del post["slug"]
-            del post["editor"]
+    def publish(self) -> None:
+        """move staged files into place, claimed directories are swapped in \
+with a rename each"""
 
-            if code is not OK:
-                return code
+        log(f"publishing {self.root!r}")
 
-            post["edited"] = datetime.datetime.utcnow().timestamp()
+        trash: str = f"{self.root}.old"
+        shutil.rmtree(trash, ignore_errors=True)
+        os.makedirs(trash)
 
-    return OK
+        def _publish(rel: str) -> None:
+            with os.scandir(os.path.join(self.root, rel)) as entries:
+                for entry in entries:
+                    path: str = os.path.join(rel, entry.name)
 
+                    if path in self.claimed:
+                        if os.path.exists(path):
+                            os.rename(path, old := f"{trash}/{len(os.listdir(trash))}")
+                            os.rename(entry.path, path)
+                            shutil.rmtree(old)
+                        else:
+                            os.rename(entry.path, path)
+                    elif entry.is_dir():
+                        os.makedirs(path, exist_ok=True)
+                        _publish(path)
+                    else:
+                        os.replace(entry.path, path)
 
-@cmds.new
-def rm(config: dict[str, typing.Any]) -> int:
-    """remove posts"""
+        _publish("")
 
-    for slug in select_posts(config["posts"]):
-        imp(f"deleting {slug!r}")
-        del config["posts"][slug]
+        for hook in self.hooks:
+            hook()
 
-    return OK
+        shutil.rmtree(trash)
+        self.discard()
 
+        log(f"wrote {self.written} file(s), {self.unchanged} unchanged")
 
-@cmds.new
-def build(config: dict[str, typing.Any]) -> int:
-    """build blog posts"""
+    def discard(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
 
-    if not config["posts"]:
-        return err("no posts to be built")
 
-    log("compiling regex")
+output: Output | None = None
 
-    web_mini.html.html_fns.compileall()
 
-    log("setting up posts directory")
+def staged(
+    cmd: typing.Callable[[Config], int],
+) -> typing.Callable[[Config], int]:
+    """stage everything `cmd` outputs and publish it only if `cmd` succeeds, \
+nested staged commands share the outermost stage"""
 
-    if os.path.exists(config["posts-dir"]):
-        shutil.rmtree(config["posts-dir"])
+    @functools.wraps(cmd)
+    def wrapper(config: Config) -> int:
+        global output
 
-    if os.path.exists("stats"):
-        shutil.rmtree("stats")
+        if output is not None:
+            return cmd(config)
 
-    os.makedirs(config["posts-dir"], exist_ok=True)
-    os.makedirs("stats", exist_ok=True)
+        output = Output(STAGE_DIR)
 
-    llog("building blog")
+        try:
+            if (code := cmd(config)) is OK:
+                output.publish()
+
+            return code
+        finally:
+            output.discard()
+            output = None
+
+    return wrapper
+
+
+# blog storage
+
+
+def read_text(path: str) -> str:
+    with open(path, "r") as fp:
+        return fp.read()
+
+
+class Post:
+    """a blog post, `content` is read from `source` on first access if it \
+was not loaded along with the rest of the post"""
+
+    __slots__: typing.Tuple[str, ...] = (
+        "title",
+        "description",
+        "_content",
+        "keywords",
+        "created",
+        "edited",
+        "extra",
+        "source",
+    )
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        content: str | None,
+        keywords: typing.Iterable[str],
+        created: float,
+        edited: float | None = None,
+        extra: typing.Dict[str, typing.Any] | None = None,
+        source: typing.Callable[[], str] | None = None,
+    ) -> None:
+        self.title: str = title
+        self.description: str = description
+        self._content: str | None = content
+        self.keywords: typing.Tuple[str, ...] = tuple(keywords)
+        self.created: float = created
+        self.edited: float | None = edited
+        self.extra: typing.Dict[str, typing.Any] | None = extra
+        self.source: typing.Callable[[], str] | None = source
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.source()  # type: ignore
+
+        return self._content  # type: ignore
+
+    @content.setter
+    def content(self, content: str) -> None:
+        self._content = content
+
+    @property
+    def loaded(self) -> bool:
+        return self._content is not None
+
+    @property
+    def changed(self) -> float:
+        return self.created if self.edited is None else self.edited
+
+    @classmethod
+    def from_json(
+        cls,
+        data: typing.Dict[str, typing.Any],
+        source: typing.Callable[[], str] | None = None,
+    ) -> Post:
+        data = data.copy()
+
+        return cls(
+            data.pop("title"),
+            data.pop("description"),
+            data.pop("content", None),
+            data.pop("keywords"),
+            data.pop("created"),
+            data.pop("edited", None),
+            data or None,
+            source,
+        )
+
+    def to_json(self, content: bool = True) -> typing.Dict[str, typing.Any]:
+        data: typing.Dict[str, typing.Any] = {
+            "title": self.title,
+            "description": self.description,
+        }
+
+        if content:
+            data["content"] = self.content
+
+        data["keywords"] = list(self.keywords)
+        data["created"] = self.created
+
+        if self.edited is not None:
+            data["edited"] = self.edited
+
+        if self.extra:
+            data.update(self.extra)
+
+        return data
+
+
+def posts_from_json(
+    posts: typing.Dict[str, typing.Dict[str, typing.Any]],
+    source: typing.Callable[[str], typing.Callable[[], str] | None] = lambda _: None,
+) -> typing.Dict[str, Post]:
+    return {slug: Post.from_json(post, source(slug)) for slug, post in posts.items()}
+
+
+def posts_to_json(
+    posts: typing.Mapping[str, Post], content: bool = True
+) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    return {slug: post.to_json(content) for slug, post in posts.items()}
+
+
+class BlogEvent(typing.NamedTuple):
+    """a config key and its value, or a slug and its post if `post`"""
+
+    post: bool
+    key: str
+    value: typing.Any
+
+
+def read_blog(fp: typing.BinaryIO) -> typing.Iterator[BlogEvent]:
+    """events of a `blog.json` file as it is read, posts one at a time"""
+
+    reader: JsonReader = JsonReader(fp)
+
+    for key in reader.members():
+        if key == "posts":
+            for slug in reader.members():
+                yield BlogEvent(True, slug, Post.from_json(reader.value()))
+        else:
+            yield BlogEvent(False, key, reader.value())
+
+
+class PostStore(typing.MutableMapping[str, Post]):
+    """posts ordered newest first, indexed by keyword, by creation year and \
+month and by slug, posts edited in place have to be set again to be reindexed"""
+
+    __slots__: typing.Tuple[str, ...] = (
+        "posts",
+        "indexed",
+        "order",
+        "slugs",
+        "keywords",
+        "dates",
+    )
+
+    def __init__(self, posts: typing.Mapping[str, Post] = {}) -> None:
+        self.posts: typing.Dict[str, Post] = dict(posts)
+        self.indexed: typing.Dict[
+            str,
+            typing.Tuple[
+                typing.Tuple[float, str], typing.Tuple[str, ...], typing.Tuple[int, int]
+            ],
+        ] = {}
+        self.keywords: typing.Dict[str, typing.Set[str]] = {}
+        self.dates: typing.Dict[typing.Tuple[int, int], typing.Set[str]] = {}
+
+        for slug, post in self.posts.items():
+            self.index(slug, post)
+
+        self.order: typing.List[typing.Tuple[float, str]] = sorted(
+            key for key, _, _ in self.indexed.values()
+        )
+        self.slugs: typing.List[str] = sorted(self.posts)
+
+    def index(self, slug: str, post: Post) -> typing.Tuple[float, str]:
+        created: datetime.datetime = datetime.datetime.utcfromtimestamp(post.created)
+        key: typing.Tuple[float, str] = (-post.created, slug)
+        keywords: typing.Tuple[str, ...] = post.keywords
+        date: typing.Tuple[int, int] = (created.year, created.month)
+
+        for keyword in keywords:
+            self.keywords.setdefault(keyword, set()).add(slug)
+
+        self.dates.setdefault(date, set()).add(slug)
+        self.indexed[slug] = key, keywords, date
+
+        return key
+
+    def unindex(self, slug: str) -> None:
+        key, keywords, date = self.indexed.pop(slug)
+
+        for index, keys in (self.keywords, keywords), (self.dates, (date,)):
+            for k in keys:
+                index[k].discard(slug)  # type: ignore
+
+                if not index[k]:  # type: ignore
+                    del index[k]  # type: ignore
+
+        del self.order[bisect.bisect_left(self.order, key)]
+        del self.slugs[bisect.bisect_left(self.slugs, slug)]
+
+    def __getitem__(self, slug: str) -> Post:
+        return self.posts[slug]
+
+    def __setitem__(self, slug: str, post: Post) -> None:
+        if slug in self.posts:
+            self.unindex(slug)
+
+        self.posts[slug] = post
+        bisect.insort(self.order, self.index(slug, post))
+        bisect.insort(self.slugs, slug)
+
+    def __delitem__(self, slug: str) -> None:
+        self.unindex(slug)
+        del self.posts[slug]
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self.posts
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return (slug for _, slug in self.order)
+
+    def __reversed__(self) -> typing.Iterator[str]:
+        return (slug for _, slug in reversed(self.order))
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def latest(self, n: int) -> typing.List[typing.Tuple[str, Post]]:
+        return [(slug, self.posts[slug]) for _, slug in self.order[:n]]
+
+    def ordered(self, slugs: typing.Iterable[str]) -> typing.List[str]:
+        """`slugs` newest first"""
+
+        return sorted(slugs, key=lambda slug: self.indexed[slug][0])
+
+    def with_prefix(self, prefix: str) -> typing.List[str]:
+        start: int = bisect.bisect_left(self.slugs, prefix)
+        end: int = bisect.bisect_left(self.slugs, prefix + chr(0x10FFFF), start)
+
+        return self.slugs[start:end]
+
+    def by_keyword(self, keyword: str) -> typing.Set[str]:
+        return set(self.keywords.get(keyword, ()))
+
+    def by_date(self, year: int, month: int | None = None) -> typing.Set[str]:
+        if month is not None:
+            return set(self.dates.get((year, month), ()))
+
+        slugs: typing.Set[str] = set()
+
+        for (y, _), dated in self.dates.items():
+            if y == year:
+                slugs |= dated
+
+        return slugs
+
+
+class Store(abc.ABC):
+    """where the config and posts are kept"""
+
+    name: str
+
+    @abc.abstractmethod
+    def exists(self) -> bool:
+        """is a blog kept in this store"""
+
+    @abc.abstractmethod
+    def load(self) -> dict[str, typing.Any]:
+        """the config with every post in it"""
+
+    @abc.abstractmethod
+    def save(
+        self,
+        config: Config,
+        indent: int | None,
+        slugs: typing.Set[str] | None = None,
+    ) -> None:
+        """save the blog, `slugs` are the only posts which changed if given"""
+
+    @abc.abstractmethod
+    def export(self, config: Config) -> bytes:
+        """the whole blog as a single json document, as served by the api"""
+
+    def stream(self) -> typing.Generator[BlogEvent, None, None]:
+        """the config and posts in stored order, read as they are needed"""
+
+        config: dict[str, typing.Any] = self.load()
+
+        for key, value in config.items():
+            if key != "posts":
+                yield BlogEvent(False, key, value)
+
+        for slug, post in config["posts"].items():
+            yield BlogEvent(True, slug, post)
+
+    def select(
+        self,
+        keyword: str | None,
+        created: typing.Tuple[float, float] | None,
+    ) -> typing.Iterator[typing.Tuple[str, Post]] | None:
+        """posts with `keyword` created within `[start, end)` of `created`, \
+none if they can only be filtered once every post is read"""
+
+        return None
+
+    def search(self, config: Config, query: str) -> typing.List[str]:
+        """slugs of posts containing every word of `query`"""
+
+        words: typing.List[str] = query.casefold().split()
+
+        return [
+            slug
+            for slug, post in config["posts"].items()
+            if all(
+                word in f"{post.title}\n{post.description}\n{post.content}".casefold()
+                for word in words
+            )
+        ]
+
+
+class JsonStore(Store):
+    """everything in a single json file, changes to single posts are appended \
+to a journal next to it and replayed on load until the blog is compacted"""
+
+    def __init__(self, path: str) -> None:
+        self.name = path
+        self.journal: str = f"{os.path.splitext(path)[0]}.journal"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.name)
+
+    def records(self) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """journal records, oldest first, each holds the `time` of a change, \
+the `slug` of the post and the `post` as saved or null if it was removed"""
+
+        try:
+            with open(self.journal, "rb") as fp:
+                for line in fp:
+                    if not line.strip():
+                        continue
+
+                    try:
+                        yield json_loads(line)
+                    except ValueError:
+                        imp(f"skipping a record cut off in {self.journal!r}")
+        except FileNotFoundError:
+            pass
+
+    def replay(self) -> typing.Dict[str, typing.Dict[str, typing.Any] | None]:
+        """the latest journal record of every post in it"""
+
+        return {record["slug"]: record["post"] for record in self.records()}
+
+    def load(self) -> dict[str, typing.Any]:
+        with open(self.name, "rb") as fp:
+            config: dict[str, typing.Any] = json_loads(fp.read())
+
+        for slug, post in self.replay().items():
+            if post is None:
+                config["posts"].pop(slug, None)
+            else:
+                config["posts"][slug] = post
+
+        config["posts"] = posts_from_json(config["posts"])
+        return config
+
+    def stream(self) -> typing.Generator[BlogEvent, None, None]:
+        journal: typing.Dict[str, typing.Dict[str, typing.Any] | None] = self.replay()
+
+        with open(self.name, "rb") as fp:
+            for event in read_blog(fp):
+                if not event.post or event.key not in journal:
+                    yield event
+                elif (post := journal.pop(event.key)) is not None:
+                    yield BlogEvent(True, event.key, Post.from_json(post))
+
+        for slug, post in journal.items():
+            if post is not None:
+                yield BlogEvent(True, slug, Post.from_json(post))
+
+    def save(
+        self,
+        config: Config,
+        indent: int | None,
+        slugs: typing.Set[str] | None = None,
+    ) -> None:
+        if slugs is not None and self.exists():
+            now: float = datetime.datetime.utcnow().timestamp()
+            posts: typing.Mapping[str, Post] = config["posts"]
+
+            append_lines(
+                self.journal,
+                (
+                    json_dumps(
+                        {
+                            "time": now,
+                            "slug": slug,
+                            "post": posts[slug].to_json() if slug in posts else None,
+                        }
+                    )
+                    for slug in sorted(slugs)
+                ),
+            )
+            return
+
+        write_atomic(
+            self.name,
+            json_dumps({**config, "posts": posts_to_json(config["posts"])}, indent),
+        )
+
+        # replaying the journal on top of a snapshot which has it folded in
+        # changes nothing, so a crash before this line loses nothing
+
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+
+    def export(self, config: Config) -> bytes:
+        return json_dumps(
+            {**config, "posts": posts_to_json(config["posts"])},
+            config["indent"] if NCI else None,
+        )
+
+
+class SplitStore(Store):
+    """config and post metadata in `index.json`, post content in \
+`posts/<slug>.md`, so only the posts which get used have their content read"""
+
+    def __init__(self, path: str) -> None:
+        self.name = path
+        self.index: str = f"{path}/index.json"
+        self.posts: str = f"{path}/posts"
+
+    def content_path(self, slug: str) -> str:
+        return f"{self.posts}/{slug}.md"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.index)
+
+    def load(self) -> dict[str, typing.Any]:
+        with open(self.index, "rb") as fp:
+            config: dict[str, typing.Any] = json_loads(fp.read())
+
+        config["posts"] = posts_from_json(
+            config["posts"],
+            lambda slug: functools.partial(read_text, self.content_path(slug)),
+        )
+
+        return config
+
+    def save(
+        self,
+        config: Config,
+        indent: int | None,
+        slugs: typing.Set[str] | None = None,
+    ) -> None:
+        os.makedirs(self.posts, exist_ok=True)
+
+        for slug, post in config["posts"].items():
+            path: str = self.content_path(slug)
+
+            if (post.loaded or not os.path.exists(path)) and not same_content(
+                path, content := post.content.encode()
+            ):
+                write_atomic(path, content)
+
+        for entry in os.scandir(self.posts):
+            if entry.name.endswith(".md") and entry.name[:-3] not in config["posts"]:
+                imp(f"removing content of deleted post {entry.name[:-3]!r}")
+                os.remove(entry.path)
+
+        write_atomic(
+            self.index,
+            json_dumps(
+                {
+                    **config,
+                    "posts": posts_to_json(config["posts"], content=False),
+                },
+                indent,
+            ),
+        )
+
+    def export(self, config: Config) -> bytes:
+        return json_dumps({**config, "posts": posts_to_json(config["posts"])})
+
+
+SQLITE_SCHEMA: typing.Final[str] = """
+CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+
+CREATE TABLE IF NOT EXISTS posts (
+    slug TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    content TEXT NOT NULL,
+    keywords TEXT NOT NULL,
+    created NOT NULL,
+    edited,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (created);
+CREATE INDEX IF NOT EXISTS posts_edited ON posts (edited);
+
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT NOT NULL,
+    slug TEXT NOT NULL REFERENCES posts (slug) ON DELETE CASCADE,
+    PRIMARY KEY (keyword, slug)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS keywords_slug ON keywords (slug);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5 (
+    title, description, content, content = 'posts', content_rowid = 'rowid'
+);
+CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts (rowid, title, description, content)
+    VALUES (new.rowid, new.title, new.description, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, description, content)
+    VALUES ('delete', old.rowid, old.title, old.description, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, description, content)
+    VALUES ('delete', old.rowid, old.title, old.description, old.content);
+    INSERT INTO posts_fts (rowid, title, description, content)
+    VALUES (new.rowid, new.title, new.description, new.content);
+END;
+"""
+
+db_conns: local = local()
+
+
+def sqlite_connect(path: str) -> sqlite3.Connection:
+    """a connection to the database at `path` for the current thread"""
+
+    import sqlite3
+
+    conns: dict[str, sqlite3.Connection] = db_conns.__dict__.setdefault("conns", {})
+
+    if (db := conns.get(path)) is None:
+        db = conns[path] = sqlite3.connect(path)
+        db.execute("PRAGMA foreign_keys = ON")
+
+    return db
+
+
+def sqlite_content(path: str, slug: str) -> str:
+    return (
+        sqlite_connect(path)
+        .execute("SELECT content FROM posts WHERE slug = ?", (slug,))
+        .fetchone()[0]
+    )
+
+
+class SqliteStore(Store):
+    """config and posts in a sqlite database, posts are indexed by creation \
+and edit time and keyword and full-text searchable, changes to single posts \
+are saved as single row transactions"""
+
+    def __init__(self, path: str) -> None:
+        self.name = path
+        self.ready: bool = False
+
+    def connect(self) -> sqlite3.Connection:
+        db: sqlite3.Connection = sqlite_connect(self.name)
+
+        if not self.ready:
+            db.executescript(SQLITE_SCHEMA)
+            self.ready = True
+
+        return db
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.name)
+
+    def load(self) -> dict[str, typing.Any]:
+        db: sqlite3.Connection = self.connect()
+
+        # the posts key holds null, it only keeps its place in the config
+
+        config: dict[str, typing.Any] = {
+            key: json_loads(value)
+            for key, value in db.execute("SELECT key, value FROM config ORDER BY rowid")
+        }
+
+        config["posts"] = dict(self.posts(db, "", ()))
+
+        return config
+
+    def posts(
+        self, db: sqlite3.Connection, where: str, args: typing.Sequence[typing.Any]
+    ) -> typing.Iterator[typing.Tuple[str, Post]]:
+        """posts matching `where`, content is read when needed"""
+
+        for slug, title, description, keywords, created, edited, extra in db.execute(
+            "SELECT slug, title, description, keywords, created, edited, extra "
+            f"FROM posts {where}",
+            args,
+        ):
+            yield slug, Post(
+                title,
+                description,
+                None,
+                json_loads(keywords),
+                created,
+                edited,
+                None if extra is None else json_loads(extra),
+                functools.partial(sqlite_content, self.name, slug),
+            )
+
+    def stream(self) -> typing.Generator[BlogEvent, None, None]:
+        db: sqlite3.Connection = self.connect()
+
+        for key, value in db.execute("SELECT key, value FROM config ORDER BY rowid"):
+            if key != "posts":
+                yield BlogEvent(False, key, json_loads(value))
+
+        for slug, post in self.posts(db, "", ()):
+            yield BlogEvent(True, slug, post)
+
+    def select(
+        self,
+        keyword: str | None,
+        created: typing.Tuple[float, float] | None,
+    ) -> typing.Iterator[typing.Tuple[str, Post]] | None:
+        where: typing.List[str] = []
+        args: typing.List[typing.Any] = []
+
+        if keyword is not None:
+            where.append("slug IN (SELECT slug FROM keywords WHERE keyword = ?)")
+            args.append(keyword)
+
+        if created is not None:
+            where.append("created >= ? AND created < ?")
+            args.extend(created)
+
+        return self.posts(
+            self.connect(), f"WHERE {' AND '.join(where)}" if where else "", args
+        )
+
+    def put(self, db: sqlite3.Connection, slug: str, post: Post, content: bool) -> None:
+        db.execute(
+            """INSERT INTO posts
+(slug, title, description, content, keywords, created, edited, extra)
+VALUES (:slug, :title, :description, COALESCE(:content, ''), :keywords, :created, :edited, :extra)
+ON CONFLICT (slug) DO UPDATE SET
+    title = excluded.title,
+    description = excluded.description,
+    content = COALESCE(:content, posts.content),
+    keywords = excluded.keywords,
+    created = excluded.created,
+    edited = excluded.edited,
+    extra = excluded.extra""",
+            {
+                "slug": slug,
+                "title": post.title,
+                "description": post.description,
+                "content": post.content if content or post.loaded else None,
+                "keywords": json_dumps(post.keywords).decode(),
+                "created": post.created,
+                "edited": post.edited,
+                "extra": (
+                    None if post.extra is None else json_dumps(post.extra).decode()
+                ),
+            },
+        )
+
+        db.execute("DELETE FROM keywords WHERE slug = ?", (slug,))
+        db.executemany(
+            "INSERT OR IGNORE INTO keywords (keyword, slug) VALUES (?, ?)",
+            ((keyword, slug) for keyword in post.keywords),
+        )
+
+    def save(
+        self,
+        config: Config,
+        indent: int | None,
+        slugs: typing.Set[str] | None = None,
+    ) -> None:
+        db: sqlite3.Connection = self.connect()
+        posts: PostStore = config["posts"]
+
+        if slugs is not None:
+            for slug in slugs:
+                with db:
+                    if slug in posts:
+                        self.put(db, slug, posts[slug], False)
+                    else:
+                        db.execute("DELETE FROM posts WHERE slug = ?", (slug,))
+
+            return
+
+        with db:
+            db.execute("DELETE FROM config")
+            db.executemany(
+                "INSERT INTO config (key, value) VALUES (?, ?)",
+                (
+                    (key, "null" if key == "posts" else json_dumps(value).decode())
+                    for key, value in config.items()
+                ),
+            )
+
+            stored: typing.Set[str] = {
+                slug for slug, in db.execute("SELECT slug FROM posts")
+            }
+
+            db.executemany(
+                "DELETE FROM posts WHERE slug = ?",
+                ((slug,) for slug in stored - set(posts)),
+            )
+
+            for slug, post in posts.items():
+                self.put(db, slug, post, slug not in stored)
+
+    def export(self, config: Config) -> bytes:
+        posts: PostStore = config["posts"]
+
+        for slug, content in self.connect().execute("SELECT slug, content FROM posts"):
+            if slug in posts and not posts[slug].loaded:
+                posts[slug].content = content
+
+        return json_dumps({**config, "posts": posts_to_json(posts)})
+
+    def search(self, config: Config, query: str) -> typing.List[str]:
+        return [
+            slug
+            for slug, in self.connect().execute(
+                "SELECT posts.slug FROM posts_fts "
+                "JOIN posts ON posts.rowid = posts_fts.rowid "
+                "WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts)",
+                (
+                    " ".join(
+                        f'"{word.replace(chr(34), chr(34) * 2)}"'
+                        for word in query.split()
+                    ),
+                ),
+            )
+        ]
+
+
+def open_store() -> Store:
+    """the sqlite database, split store or single json file, whichever \
+the blog is kept in"""
+
+    for candidate in SqliteStore(DB_FILE), SplitStore(STORE_DIR):
+        if candidate.exists():
+            return candidate
+
+    return JsonStore(CONFIG_FILE)
+
+
+store: Store = JsonStore(CONFIG_FILE)
+changes: typing.Set[str | None] = set()
+
+
+def touch(slug: str | None = None) -> None:
+    """mark the post `slug`, or the whole blog if not given, as changed, \
+so it gets saved after the command"""
+
+    changes.add(slug)
+
+
+streaming: typing.Set[typing.Callable[[Config], int]] = set()
+
+
+def streamed(
+    cmd: typing.Callable[[Config], int],
+) -> typing.Callable[[Config], int]:
+    """`cmd` only reads the blog, its `config["posts"]` iterates over \
+`(slug, post)` pairs in stored order as they are read instead of being a \
+`PostStore` of all of them"""
+
+    streaming.add(cmd)
+    return cmd
+
+
+def stream_config(events: typing.Iterator[BlogEvent], config: Config) -> None:
+    """read the config from `events` up to the first post, the rest of it \
+is read while iterating over `config["posts"]`"""
+
+    def posts(first: BlogEvent) -> typing.Iterator[typing.Tuple[str, Post]]:
+        yield first.key, first.value
+
+        for event in events:
+            if event.post:
+                yield event.key, event.value
+            else:
+                config[event.key] = event.value
+
+    for event in events:
+        if event.post:
+            config["posts"] = posts(event)
+            return
+
+        config[event.key] = event.value
+
+    config["posts"] = iter(())
+
+
+def min_css_file(file: str, out: str) -> None:
+    import web_mini
+
+    with open(file, "r") as icss:
+        output.write(out, web_mini.css.minify_css(icss.read()))  # type: ignore
+
+
+def critical_css(config: Config) -> typing.Tuple[str, str]:
+    """minified critical css of all pages and of posts"""
+
+    import web_mini
+
+    css: typing.List[str] = []
+
+    for name in "critical", "post_critical":
+        if os.path.isfile(path := f"{config['assets-dir']}/{name}.css"):
+            with open(path, "r") as fp:
+                css.append(web_mini.css.minify_css(fp.read()))
+        else:
+            css.append("")
+
+    return css[0], css[1]
+
+
+def most_common(
+    c: typing.Mapping[K, int], n: int | None = None
+) -> typing.List[typing.Tuple[K, int]]:
+    """like `Counter.most_common` but ties are ordered by key, \
+so the result does not depend on insertion order"""
+    return sorted(c.items(), key=lambda kv: (-kv[1], kv[0]))[:n]  # type: ignore
+
+
+def sorted_post_counter(
+    c: Counter[int],
+    pcount: int,
+    fix: str,
+) -> typing.Dict[str, typing.Any]:
+    s: int = sum(c.values())
+    avg: float = s / len(c)
+
+    return {
+        f"posts_by_{fix}": " ".join(
+            f"<li><time>{v}</time> -- <code>{p}</code> post{'' if p == 1 else 's'}, <code>{p / pcount * 100:.2f}%</code></li>"
+            for v, p in most_common(c)
+        ),
+        f"posts_by_{fix}_avg": f"<code>{round(avg, 2)}</code>, <code>{round(avg / s * 100, 2)}%</code>",
+    }
+
+
+def last_change(posts: typing.Mapping[str, Post]) -> float:
+    """time of the latest post creation or edit, so generated feeds only \
+change when posts do"""
+
+    return max(
+        (post.changed for post in posts.values()),
+        default=0.0,
+    )
+
+
+def s_to_str(seconds: float) -> str:
+    minutes, sec = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    periods: typing.Tuple[typing.Tuple[float, str, str], ...] = (
+        (round(days, 2), "day", "days"),
+        (round(hours, 2), "hour", "hours"),
+        (round(minutes, 2), "minute", "minutes"),
+        (round(sec, 2), "second", "seconds"),
+    )
+
+    time_periods: typing.List[str] = []
+
+    for period in periods:
+        if period[0] != 0:
+            time_periods.append(
+                "{} {}".format(period[0], period[1] if period[0] == 1 else period[2])
+            )
+
+    readable_text: str = ", ".join(time_periods[:-1])
+
+    if len(time_periods) > 1:
+        readable_text += " and " + time_periods[-1]
+    else:
+        readable_text = time_periods[0]
+
+    return (
+        f"{readable_text} ( {round(seconds, 2)} second{'' if seconds == 1 else 's'} )"
+    )
+
+
+class Template:
+    """a `str.format` template compiled into literal chunks, fields can be \
+bound ahead of time so rendering only fills in the remaining slots"""
+
+    __slots__: typing.Tuple[str, ...] = ("literals", "fields")
+
+    def __init__(self, fmt: str = "") -> None:
+        self.literals: typing.List[str] = [""]
+        self.fields: typing.List[typing.Tuple[str, str]] = []
+
+        for literal, field, spec, conv in string.Formatter().parse(fmt):
+            self.literals[-1] += literal
+
+            if field is None:
+                continue
+
+            if conv is not None:
+                raise ValueError(f"conversions are not supported : {field}!{conv}")
+
+            self.fields.append((field, spec or ""))
+            self.literals.append("")
+
+    def __add__(self, other: Template) -> Template:
+        t: Template = Template()
+
+        t.literals = (
+            self.literals[:-1]
+            + [self.literals[-1] + other.literals[0]]
+            + other.literals[1:]
+        )
+        t.fields = self.fields + other.fields
+
+        return t
+
+    def bind(self, **values: typing.Any) -> Template:
+        """bake `values` into the template, returns a new template"""
+
+        t: Template = Template()
+        t.literals = [self.literals[0]]
+
+        for (field, spec), literal in zip(self.fields, self.literals[1:]):
+            if field in values:
+                t.literals[-1] += format(values[field], spec) + literal
+            else:
+                t.fields.append((field, spec))
+                t.literals.append(literal)
+
+        return t
+
+    def render(self, **values: typing.Any) -> str:
+        parts: typing.List[str] = [self.literals[0]]
+
+        for (field, spec), literal in zip(self.fields, self.literals[1:]):
+            parts.append(format(values[field], spec))
+            parts.append(literal)
+
+        return "".join(parts)
+
+
+def site_templates(
+    config: Config,
+    derived: Derived,
+    crit_css: str,
+    post_crit_css: str,
+) -> typing.Dict[str, Template]:
+    """bind the site constants into the page templates"""
+
+    site: typing.Dict[str, typing.Any] = {
+        "lang": derived.lang,
+        "theme_type": config["theme"]["type"],
+        "theme_primary": config["theme"]["primary"],
+        "theme_secondary": config["theme"]["secondary"],
+        "blog": config["blog"],
+        "styles": derived.styles,
+        "critical_css": crit_css,
+        "post_critical_css": post_crit_css,
+        "gen": GEN,
+        "rss": config["rss-file"],
+        "blog_title": derived.title,
+        "blog_description": derived.description,
+        "blog_header": derived.header,
+        "author": derived.author,
+        "email": config["email"],
+        "locale": config["locale"],
+        "license": config["license"],
+        "visitor_count": config["visitor-count"],
+        "comment": config["comment"],
+        "website": config["website"],
+        "source": config["source"],
+    }
+
+    head: Template = Template(HTML_BEGIN).bind(**site)
+    bkw: str = derived.blog_keywords
+
+    return {
+        "post": head + Template(POST_TEMPLATE).bind(**site),
+        "index": (head + Template(INDEX_TEMPLATE).bind(**site)).bind(
+            keywords=bkw,
+            path="",
+        ),
+        "stats": (head + Template(STATS_TEMPLATE).bind(**site)).bind(
+            keywords=f"{bkw}, stats, statistics",
+            path="stats",
+            top_words=config["top-words"],
+            top_tags=config["top-tags"],
+            default_tags=" ".join(
+                f"<li><code>{html_escape(t)}</code></li>"
+                for t in derived.default_keywords
+            ),
+        ),
+    }
+
+
+# same pattern `web_mini.html.html_remove_whitespace` splits on
+PRE_TAGS_RE: typing.Final[re.Pattern[str]] = re.compile(
+    r"(<\s*?(?:pre|code|textarea).*?>|<\s*?/\s*?(?:pre|code|textarea)\s*?>)",
+    re.I,
+)
+WS_RE: typing.Final[re.Pattern[str]] = re.compile(r"\s")
+
+
+def minify_html(html: str) -> str:
+    import web_mini
+
+    return web_mini.html.minify_html(html)
+
+
+def minify_fragment(html: str) -> typing.Tuple[str, int]:
+    """minify a fragment of a page exactly like `web_mini.html.minify_html` \
+would minify it in place, except for whitespace at its edges, returns the \
+fragment and the pre/code/textarea nesting it leaves behind"""
+
+    import web_mini
+
+    html = web_mini.html.html_remove_comments(html)
+    html = web_mini.html.html_remove_type(html)
+    html = web_mini.html.html_remove_unneeded_tags(html)
+
+    tags: int = 0
+    split: typing.List[str] = [
+        web_mini.html.HTML_TAG_SPACE_RE.sub("> <", tag) if idx % 2 == 1 else tag
+        for idx, tag in enumerate(PRE_TAGS_RE.split(html))
+    ]
+
+    for idx, tag in enumerate(split):
+        if idx % 2 == 0 and tags == 0:
+            split[idx] = web_mini.html.HTML_TAG_BREAK_RE.sub(" ", tag)
+        elif (idx + 1) % 2 == 0:
+            tags += -1 if "/" in tag else 1
+
+    return web_mini.html.html_unquote_attrs("".join(split)), tags
+
+
+class Fragment(typing.NamedTuple):
+    """a page fragment, already minified in place unless `minified` is false"""
+
+    html: str
+    minified: bool
+
+
+def minified_fragment(html: str) -> Fragment:
+    fragment, tags = minify_fragment(html)
+    return Fragment(html, False) if tags else Fragment(fragment, True)
+
+
+class MinifiedTemplate:
+    """a `Template` whose static parts are minified once, on render only the \
+slots, or the whole tags that contain them, are minified"""
+
+    __slots__: typing.Tuple[str, ...] = ("template", "chunks", "regions")
+
+    def __init__(self, template: Template) -> None:
+        self.template: Template = template
+
+        marked: str = "\0".join(template.literals)
+        spans: typing.List[typing.List[int]] = []
+
+        for idx, c in enumerate(marked):
+            if c != "\0":
+                continue
+
+            if (start := marked.rfind("<", 0, idx)) > marked.rfind(">", 0, idx):
+                span = [start, marked.index(">", idx) + 1]  # slot inside of a tag
+            else:
+                span = [idx, idx + 1]
+
+            if spans and span[0] < spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], span[1])
+            else:
+                spans.append(span)
+
+        self.regions: typing.List[Template] = []
+        static: typing.List[str] = []
+        fields: typing.Iterator[typing.Tuple[str, str]] = iter(template.fields)
+        end: int = 0
+
+        for start, stop in spans:
+            region: Template = Template()
+            region.literals = marked[start:stop].split("\0")
+            region.fields = [next(fields) for _ in region.literals[1:]]
+
+            self.regions.append(region)
+            static.append(marked[end:start])
+            end = stop
+
+        static.append(marked[end:])
+
+        if PRE_TAGS_RE.search("".join(static)):
+            raise ValueError(
+                "static template parts cannot contain pre, code or textarea"
+            )
+
+        self.chunks: typing.List[str] = minify_html("\0".join(static)).split("\0")
+
+        if len(self.chunks) != len(spans) + 1 or not (
+            self.chunks[0] and self.chunks[-1]
+        ):
+            raise ValueError("template slots cannot be at the edges of a page")
+
+    def render(self, **values: typing.Any) -> str:
+        out: typing.List[str] = [self.chunks[0]]
+
+        for region, chunk in zip(self.regions, self.chunks[1:]):
+            fragment: str
+            tags: int = 0
+
+            if region.literals == ["", ""] and isinstance(
+                value := values[region.fields[0][0]], Fragment
+            ):
+                fragment, tags = value.html, int(not value.minified)
+            else:
+                fragment, tags = minify_fragment(region.render(**values))
+
+            if tags != 0:  # unbalanced pre/code would change how the rest is minified
+                return minify_html(
+                    self.template.render(
+                        **{
+                            k: v.html if isinstance(v, Fragment) else v
+                            for k, v in values.items()
+                        }
+                    )
+                )
+
+            for piece in fragment, chunk:
+                if not piece:
+                    continue
+
+                # whitespace runs meeting at a boundary collapse into one space
+                if WS_RE.match(piece) and WS_RE.match(out[-1][-1]):
+                    piece = piece[1:]
+
+                    if out[-1][-1] != " ":
+                        out[-1] = out[-1][:-1] + " "
+
+                    if not piece:
+                        continue
+
+                out.append(piece)
+
+        return "".join(out)
+
+
+# registers of `TopWords.distinct` are picked by the top bits of a word hash
+HLL_BITS: typing.Final[int] = 14
+
+
+class TopWords:
+    """approximate counts of the most used words in at most `size` counters, \
+kept by the space-saving algorithm, a word is never counted less than it is \
+used and at most `error` more, which is at most all words over `size`, \
+distinct words are estimated by a hyperloglog"""
+
+    __slots__: typing.Tuple[str, ...] = ("size", "counts", "heap", "registers")
+
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.counts: typing.Dict[str, int] = {}
+        self.heap: typing.List[typing.Tuple[int, str]] = []
+        self.registers: bytearray = bytearray(1 << HLL_BITS)
+
+    @classmethod
+    def of(cls, words: Counter[str], size: int) -> TopWords:
+        """summary of exactly counted `words`, the ones which do not fit are \
+used no more than the least counted word kept"""
+
+        top: TopWords = cls(size)
+        top.see(words)
+
+        top.counts = dict(most_common(words, size))
+        top.heap = [(uses, word) for word, uses in top.counts.items()]
+        heapq.heapify(top.heap)
+
+        return top
+
+    def see(self, words: typing.Iterable[str]) -> None:
+        registers: bytearray = self.registers
+        mask: int = (1 << (64 - HLL_BITS)) - 1
+
+        for word in words:
+            h: int = int.from_bytes(
+                hashlib.blake2b(word.encode(), digest_size=8).digest(), "big"
+            )
+            rank: int = 65 - HLL_BITS - (h & mask).bit_length()
+
+            if rank > registers[(idx := h >> (64 - HLL_BITS))]:
+                registers[idx] = rank
+
+    def least(self) -> typing.Tuple[int, str]:
+        """the least counted word, every kept word has one heap entry which is \
+only moved up to its count once it comes out on top, as counts only grow"""
+
+        while (uses := self.counts[(low := self.heap[0])[1]]) != low[0]:
+            heapq.heapreplace(self.heap, (uses, low[1]))
+
+        return low
+
+    def update(self, words: typing.Mapping[str, int]) -> None:
+        counts: typing.Dict[str, int] = self.counts
+        self.see(word for word in words if word not in counts)  # kept ones are seen
+
+        for word, uses in words.items():
+            if word in counts:
+                counts[word] += uses
+            elif len(counts) < self.size:
+                counts[word] = uses
+                heapq.heappush(self.heap, (uses, word))
+            else:
+                low, evicted = self.least()
+
+                del counts[evicted]
+                counts[word] = low + uses
+
+                heapq.heapreplace(self.heap, (low + uses, word))
+
+    @property
+    def error(self) -> int:
+        return self.least()[0] if len(self.counts) >= self.size else 0
+
+    def distinct(self) -> int:
+        m: int = len(self.registers)
+        estimate: float = (
+            0.7213 / (1 + 1.079 / m) * m * m / sum(2.0**-r for r in self.registers)
+        )
+
+        if estimate <= 2.5 * m and (zeros := self.registers.count(0)):
+            estimate = m * math.log(m / zeros)
+
+        return round(estimate)
+
+
+class BuildStats:
+    """statistics of posts, made for each post from its metadata and \
+`PostText` and folded into one as they come in, words are counted exactly \
+until there are more than `exact_words` distinct ones and by `TopWords` from \
+then on"""
+
+    __slots__: typing.Tuple[str, ...] = (
+        "posts",
+        "edited",
+        "read_time",
+        "chars",
+        "word_count",
+        "words",
+        "top",
+        "exact_words",
+        "word_counters",
+        "tags",
+        "years",
+        "months",
+        "days",
+        "hours",
+    )
+
+    def __init__(self, exact_words: int | None = None, word_error: float = 1.0) -> None:
+        self.posts: int = 0
+        self.edited: int = 0
+        self.read_time: int = 0
+        self.chars: int = 0
+        self.word_count: int = 0
+
+        self.words: Counter[str] = Counter()
+        self.top: TopWords | None = None
+        self.exact_words: int | None = exact_words
+        self.word_counters: int = math.ceil(1 / word_error)
+
+        self.tags: Counter[str] = Counter()
+
+        self.years: Counter[int] = Counter()
+        self.months: Counter[int] = Counter()
+        self.days: Counter[int] = Counter()
+        self.hours: Counter[int] = Counter()
+
+    @classmethod
+    def of_post(cls, post: Post, text: PostText, wpm: int) -> BuildStats:
+        stats: BuildStats = cls()
+
+        stats.posts = 1
+        stats.edited = int(post.edited is not None)
+        stats.read_time = text.read_time(wpm)
+        stats.chars = text.chars + 1 + len(post.title)
+
+        stats.words.update(text.words)
+        stats.words.update(plain_words(post.title))
+        stats.word_count = sum(stats.words.values())
+        stats.tags.update(post.keywords)
+
+        dt: datetime.datetime = datetime.datetime.utcfromtimestamp(post.created)
+
+        stats.years[dt.year] += 1
+        stats.months[dt.month] += 1
+        stats.days[dt.day] += 1
+        stats.hours[dt.hour] += 1
+
+        return stats
+
+    def merge(self, other: BuildStats) -> BuildStats:
+        """fold the exactly counted `other` into these stats"""
+
+        self.posts += other.posts
+        self.edited += other.edited
+        self.read_time += other.read_time
+        self.chars += other.chars
+        self.word_count += other.word_count
+
+        if self.top is not None:
+            self.top.update(other.words)
+        else:
+            self.words.update(other.words)
+
+            if self.exact_words is not None and len(self.words) > self.exact_words:
+                self.top = TopWords.of(self.words, self.word_counters)
+                self.words = Counter()
+
+        self.tags.update(other.tags)
+
+        self.years.update(other.years)
+        self.months.update(other.months)
+        self.days.update(other.days)
+        self.hours.update(other.hours)
+
+        return self
+
+    def word_counts(self) -> typing.Tuple[typing.Mapping[str, int], int]:
+        """counts of the words and how many distinct words there are"""
+
+        if self.top is None:
+            return self.words, len(self.words)
+
+        return self.top.counts, self.top.distinct()
+
+    def render(self, config: Config, template: Template) -> str:
+        """the stats page"""
+
+        char_count: int = self.chars
+        post_count: int = self.posts
+        epost_count: int = self.edited
+
+        rts: int = self.read_time
+
+        wcs: int = self.word_count
+        words, wcl = self.word_counts()
+
+        tcs: int = sum(self.tags.values())
+        tcl: int = len(self.tags)
+
+        avg_chars: float = char_count / post_count
+        avg_words: float = wcs / post_count
+        avg_tags: float = tcs / post_count
+
+        return minify_html(
+            template.render(
+                post_count=post_count,
+                edited_post_count=epost_count,
+                edited_post_count_p=epost_count / post_count * 100,
+                read_time=s_to_str(rts),
+                avg_read_time=s_to_str(rts / post_count),
+                char_count=char_count,
+                avg_chars=avg_chars,
+                word_count=wcs,
+                avg_words=avg_words,
+                avg_word_len=avg_chars / avg_words,
+                word_most_used=" ".join(
+                    f"<li><code>{html_escape(w)}</code>, <code>{u}</code> use{'' if u == 1 else 's'}, <code>{u / wcl * 100:.2f}%</code></li>"
+                    for w, u in most_common(words, config["top-words"])
+                ),
+                tag_count=tcs,
+                avg_tags=avg_tags,
+                tags_most_used=" ".join(
+                    f"<li><code>{html_escape(w)}</code>, <code>{u}</code> use{'' if u == 1 else 's'}, <code>{u / tcl * 100:.2f}%</code></li>"
+                    for w, u in most_common(self.tags, config["top-tags"])
+                ),
+                **sorted_post_counter(self.years, post_count, "yr"),
+                **sorted_post_counter(self.months, post_count, "month"),
+                **sorted_post_counter(self.days, post_count, "day"),
+                **sorted_post_counter(self.hours, post_count, "hr"),
+            )
+        )
+
+    def to_json(self, config: Config) -> typing.Dict[str, typing.Any]:
+        """the numbers behind the stats page, for `stats.json`"""
+
+        words, distinct = self.word_counts()
+        tags: int = sum(self.tags.values())
+
+        return {
+            "posts": self.posts,
+            "edited": self.edited,
+            "read-time": {
+                "total": self.read_time,
+                "average": self.read_time / self.posts,
+            },
+            "chars": {
+                "total": self.chars,
+                "average": self.chars / self.posts,
+            },
+            "words": {
+                "total": self.word_count,
+                "unique": distinct,
+                "average": self.word_count / self.posts,
+                "average-length": self.chars / self.word_count,
+                "top": most_common(words, config["top-words"]),
+                "error": 0 if self.top is None else self.top.error,
+            },
+            "tags": {
+                "total": tags,
+                "unique": len(self.tags),
+                "average": tags / self.posts,
+                "top": most_common(self.tags, config["top-tags"]),
+            },
+            "posts-by": {
+                "year": sorted(self.years.items()),
+                "month": sorted(self.months.items()),
+                "day": sorted(self.days.items()),
+                "hour": sorted(self.hours.items()),
+            },
+        }
+
+
+def write_api(out: Output, api: str, data: bytes) -> None:
+    """write `api` along with a hash of it, clients poll the hash to know \
+when to fetch it again"""
+
+    out.write(api, data)
+    lnew(f"generated {api!r}")
+
+    out.write(
+        hf := f"{api.replace('.', '_')}_hash.txt",
+        hashlib.sha256(data).hexdigest(),
+    )
+    lnew(f"generated {hf!r}")
+
+
+def write_stats(
+    out: Output, config: Config, stats: BuildStats, template: Template
+) -> None:
+    out.write("stats/index.html", stats.render(config, template))
+    lnew("generated 'stats/index.html'")
+
+    write_api(out, "stats.json", json_dumps(stats.to_json(config)))
+
+
+# markdown
+
+TITLE_LINKS_RE: typing.Final[str] = r"<#:[^>]+?>"
+
+
+def parse_inline_titlelink(
+    _: mistune.inline_parser.InlineParser,
+    m: re.Match[str],
+    state: mistune.core.InlineState,
+) -> int:
+    text: str = m.group(0)[3:-1]
+
+    state.append_token(
+        {
+            "type": "link",
+            "children": [{"type": "text", "raw": f"# {text}"}],
+            "attrs": {"url": f"#{slugify(text, [], 768, 768)}"},
+        }
+    )
+
+    return m.end()
+
+
+def titlelink(md: mistune.Markdown) -> None:
+    md.inline.register("titlelink", TITLE_LINKS_RE, parse_inline_titlelink, before="link")  # type: ignore
+
+
+# bump whenever `BlogRenderer`, `titlelink` or `PostText` change their output,
+# this rebuilds every post as well as invalidating the render cache
+RENDERER_VERSION: typing.Final[int] = 3
+
+# tokens rendered inside of a line, anything else is a block and ends a word
+INLINE_TOKENS: typing.Final[typing.FrozenSet[str]] = frozenset(
+    (
+        "text",
+        "emphasis",
+        "strong",
+        "codespan",
+        "link",
+        "image",
+        "inline_html",
+        "linebreak",
+        "softbreak",
+        "footnote_ref",
+        "strikethrough",
+        "mark",
+        "insert",
+        "superscript",
+        "subscript",
+        "abbr",
+        "ruby",
+        "inline_math",
+    )
+)
+
+
+def token_text(
+    tokens: typing.Iterable[typing.Dict[str, typing.Any]], text: typing.List[str]
+) -> int:
+    """append the text a reader sees in the markdown `tokens` to `text`, \
+returns how many images there are"""
+
+    images: int = 0
+
+    for token in tokens:
+        kind: str = token["type"]
+
+        if kind == "image":  # alt text is not read
+            images += 1
+            continue
+
+        if kind in ("linebreak", "softbreak"):
+            text.append(" ")
+        elif kind != "footnote_ref" and "raw" in token:
+            text.append(token["raw"])
+
+        if isinstance(children := token.get("children"), list):
+            images += token_text(
+                typing.cast(typing.List[typing.Dict[str, typing.Any]], children), text
+            )
+
+        if kind not in INLINE_TOKENS:
+            text.append(" ")
+
+    return images
+
+
+def plain_words(text: str) -> typing.List[str]:
+    return [
+        word
+        for word in (word.strip(string.punctuation) for word in text.split())
+        if word
+    ]
+
+
+class PostText(typing.NamedTuple):
+    """plaintext metrics of a post, taken from its markdown ast"""
+
+    words: typing.Dict[str, int]
+    word_count: int
+    chars: int
+    images: int
+
+    @classmethod
+    def of(cls, state: mistune.core.BlockState) -> PostText:
+        text: typing.List[str] = []
+        images: int = token_text(state.tokens, text)
+
+        text.extend(f" {note}" for note in state.env.get("ref_footnotes", {}).values())
+
+        plain: str = " ".join("".join(text).split())
+        words: Counter[str] = Counter(plain_words(plain))
+
+        return cls(dict(words), sum(words.values()), len(plain), images)
+
+    def read_time(self, wpm: int) -> int:
+        """reading time in seconds, an image takes 12 seconds less one for \
+every image before it, but no less than 3"""
+
+        return math.ceil(self.word_count / wpm * 60) + sum(
+            max(3, 12 - idx) for idx in range(self.images)
+        )
+
+
+@functools.lru_cache(None)
+def blog_renderer() -> typing.Type[mistune.HTMLRenderer]:
+    """the renderer class, defined on first use as it needs mistune"""
+
+    import mistune
+
+    class BlogRenderer(mistune.HTMLRenderer):
+        def heading(self, text: str, level: int, **_: typing.Any) -> str:
+            slug: str = slugify(text, [], 768, 768)
+            level = max(2, level)
+
+            return f'<h{level} id="{slug}" h><a href="#{slug}">#</a> {text}</h{level}>'
+
+    return BlogRenderer
+
+
+class MarkdownEngine:
+    """a reusable markdown parser + renderer for a set of plugins"""
+
+    __slots__: typing.Tuple[str, ...] = ("md",)
+
+    def __init__(self, plugins: typing.Tuple[str, ...]) -> None:
+        import mistune
+
+        self.md: mistune.Markdown = mistune.create_markdown(
+            plugins=[*plugins, titlelink], renderer=blog_renderer()()  # type: ignore
+        )
+
+    def render(self, md: str) -> typing.Tuple[str, PostText]:
+        # every document gets a fresh block state, so per-document state such as
+        # footnotes, abbreviations or reference links never leaks between posts,
+        # the state keeps the ast after rendering so it is walked for the text
+        html, state = self.md.parse(md, self.md.block.state_cls())  # type: ignore
+        return typing.cast(str, html), PostText.of(state)
+
+
+md_engines: local = local()
+
+
+def markdown_engine(plugins: typing.Iterable[str]) -> MarkdownEngine:
+    engines: dict[typing.Tuple[str, ...], MarkdownEngine] | None = getattr(
+        md_engines, "engines", None
+    )
+
+    if engines is None:
+        engines = md_engines.engines = {}
+
+    if (key := tuple(plugins)) not in engines:
+        engines[key] = MarkdownEngine(key)
+
+    return engines[key]
+
+
+def markdown(md: str, plugins: typing.Iterable[str]) -> typing.Tuple[str, PostText]:
+    return markdown_engine(plugins).render(md)
+
+
+class Rendered(typing.NamedTuple):
+    fragment: Fragment
+    text: PostText
+
+
+class RenderCache:
+    """content-addressed on-disk cache of rendered and minified markdown and \
+its text metrics"""
+
+    __slots__: typing.Tuple[str, ...] = ("path",)
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+    def key(self, md: str, plugins: typing.Iterable[str]) -> str:
+        import mistune
+        import web_mini
+
+        return hash_data(
+            RENDERER_VERSION,
+            mistune.__version__,
+            web_mini.__version__,
+            list(plugins),
+            md,
+        )
+
+    def file(self, key: str) -> str:
+        return f"{self.path}/{key[:2]}/{key}.html"
+
+    def get(self, key: str) -> Rendered | None:
+        try:
+            with open(path := self.file(key), "r") as fp:
+                minified: str = fp.readline()
+                text: PostText = PostText(**json_loads(fp.readline()))
+                fragment: Fragment = Fragment(fp.read(), minified == "1\n")
+        except FileNotFoundError:
+            return None
+
+        os.utime(path)  # entries are evicted least recently used first
+        return Rendered(fragment, text)
+
+    def put(self, key: str, rendered: Rendered) -> None:
+        os.makedirs(os.path.dirname(path := self.file(key)), exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(path), delete=False
+        ) as fp:
+            fp.write(
+                f"{int(rendered.fragment.minified)}\n"
+                f"{json_dumps(rendered.text._asdict()).decode()}\n"
+                f"{rendered.fragment.html}"
+            )
+
+        os.replace(fp.name, path)
+
+    def entries(self) -> typing.List[typing.Tuple[float, int, str]]:
+        """( last use, size, path ) of every entry, least recently used first"""
+
+        entries: typing.List[typing.Tuple[float, int, str]] = []
+
+        for file in iglob(f"{self.path}/*/*.html"):
+            try:
+                st: os.stat_result = os.stat(file)
+            except FileNotFoundError:
+                continue
+
+            entries.append((st.st_mtime, st.st_size, file))
+
+        return sorted(entries)
+
+    def prune(self, max_size: int, max_age: float) -> typing.Tuple[int, int]:
+        """evict entries older than `max_age` seconds, then the least recently \
+used ones until the cache fits in `max_size` bytes, returns the count and \
+size of evicted entries"""
+
+        entries: typing.List[typing.Tuple[float, int, str]] = self.entries()
+
+        size: int = sum(e[1] for e in entries)
+        oldest: float = time.time() - max_age  # epoch seconds, like mtimes
+        count: int = 0
+        freed: int = 0
+
+        for mtime, esize, file in entries:
+            if mtime >= oldest and size - freed <= max_size:
+                break
+
+            os.remove(file)
+
+            count += 1
+            freed += esize
+
+        return count, freed
+
+
+def render_markdown(md: str, plugins: typing.Iterable[str]) -> Rendered:
+    cache: RenderCache = bctx["cache"]
+
+    if (rendered := cache.get(key := cache.key(md, plugins))) is None:
+        html, text = markdown(md, plugins)
+        rendered = Rendered(minified_fragment(html), text)
+        cache.put(key, rendered)
+
+    return rendered
+
+
+def metrics_key(md: str, plugins: typing.Iterable[str]) -> str:
+    """key of the text metrics of `md`, unlike `RenderCache.key` it does not \
+need mistune, whose version is checked by `build` instead"""
+
+    return hash_data(RENDERER_VERSION, list(plugins), md)
+
+
+# build workers
+
+PostResult = typing.Tuple[str, typing.Dict[str, typing.Any], bool, bool, str, PostText]
+
+bctx: dict[str, typing.Any] = {}
+
+
+def init_build_worker(
+    config: Config,
+    derived: Derived,
+    crit_css: str,
+    post_crit_css: str,
+    site: str,
+    stage: str,
+    metrics: typing.Dict[str, typing.Any],
+    verify: bool = False,
+) -> None:
+    import web_mini
+
+    web_mini.html.html_fns.compileall()
+
+    templates: typing.Dict[str, Template] = site_templates(
+        config, derived, crit_css, post_crit_css
+    )
+
+    bctx.update(
+        config=config,
+        derived=derived,
+        site=site,
+        stage=stage,
+        templates=templates,
+        pages={page: MinifiedTemplate(templates[page]) for page in ("post", "index")},
+        verify=verify,
+        metrics=metrics,
+        cache=RenderCache(f"{config['cache-dir']}/render"),
+    )
+
+    markdown_engine(config["markdown-plugins"])
+
+
+def render_page(
+    page: str, sources: typing.Mapping[str, str] = {}, **values: typing.Any
+) -> str:
+    """render `page` from its minified template, `--verify-minify` checks it \
+against minifying the whole page, with `sources` holding the unminified html \
+of `Fragment` values"""
+
+    html: str = bctx["pages"][page].render(**values)
+
+    if not bctx["verify"]:
+        return html
+
+    whole: typing.Dict[str, typing.Any] = {
+        k: v.html if isinstance(v, Fragment) else v for k, v in values.items()
+    }
+    whole.update(sources)
+
+    if html != (full := minify_html(bctx["templates"][page].render(**whole))):
+        raise AssertionError(
+            f"minified {page!r} page differs from full page minification "
+            f"at offset {next(idx for idx, (a, b) in enumerate(zip(html + chr(0), full + chr(0))) if a != b)}"
+        )
+
+    return html
+
+
+def build_post(
+    slug: str,
+    post: Post,
+    old: dict[str, typing.Any] | None,
+) -> PostResult:
+    ct: float = ctimer()
+    config: Config = bctx["config"]
+
+    post_dir: str = f"{config['posts-dir']}/{slug}"
+    html_path: str = f"{bctx['stage']}/{post_dir}/index.html"
+    h: str = hash_post(bctx["site"], post)
+    key: str = metrics_key(post.content, config["markdown-plugins"])
+
+    os.makedirs(os.path.dirname(html_path), exist_ok=True)
+
+    if (
+        old is not None
+        and old["hash"] == h
+        and os.path.isfile(live := f"{post_dir}/index.html")
+    ):
+        link_file(live, html_path)
+        return (
+            slug,
+            old,
+            False,
+            False,
+            key,
+            (
+                render_markdown(post.content, config["markdown-plugins"]).text
+                if (text := bctx["metrics"].get(key)) is None
+                else PostText(**text)
+            ),
+        )
+
+    rendered: Rendered = render_markdown(post.content, config["markdown-plugins"])
+    read_time: int = rendered.text.read_time(config["read-wpm"])
+
+    data: bytes = render_page(
+        "post",
+        (
+            {"post_content": markdown(post.content, config["markdown-plugins"])[0]}
+            if bctx["verify"]
+            else {}
+        ),
+        keywords=html_escape(
+            ", ".join(
+                dict.fromkeys((*post.keywords, *bctx["derived"].default_keywords))
+            )
+        ),
+        path=f"{config['posts-dir']}/{slug}",
+        post_title=html_escape(post.title),
+        post_creation_time=rformat_time(post.created),
+        post_description=html_escape(post.description),
+        post_read_time=f"{max(1, math.ceil(read_time / 60))} min",
+        post_edit_time=(
+            ""
+            if post.edited is None
+            else f", edited on <time>{rformat_time(post.edited)}</time> GMT"
+        ),
+        post_content=rendered.fragment,
+    ).encode()
+
+    if written := not same_content(live := f"{post_dir}/index.html", data):
+        with open(html_path, "wb") as html:
+            html.write(data)
+    else:
+        link_file(live, html_path)
+
+    lnew(f"built post {post.title!r} in {ctimer() - ct} s")
+
+    return (
+        slug,
+        {"hash": h},
+        True,
+        written,
+        key,
+        rendered.text,
+    )
+
+
+# dev server
+
+
+class ServedFile(typing.NamedTuple):
+    mtime: int
+    size: int
+    data: bytes
+    etag: str
+
+
+def read_served(path: str) -> ServedFile:
+    with open(path, "rb") as fp:
+        st: os.stat_result = os.fstat(fp.fileno())
+        data: bytes = fp.read()
+
+    return ServedFile(
+        st.st_mtime_ns,
+        st.st_size,
+        data,
+        f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"',
+    )
+
+
+class FileCache:
+    """files served by `serve` kept in memory, a file is read again once its \
+mtime or size changes"""
+
+    __slots__: typing.Tuple[str, ...] = ("files",)
+
+    def __init__(self) -> None:
+        self.files: typing.Dict[str, ServedFile] = {}
+
+    def get(self, path: str) -> ServedFile:
+        st: os.stat_result = os.stat(path)
+
+        if (
+            (file := self.files.get(path)) is None
+            or file.mtime != st.st_mtime_ns
+            or file.size != st.st_size
+        ):
+            file = self.files[path] = read_served(path)
+
+        return file
+
+
+# edit commands
+
+
+@ecmds.new
+def title(edit: PostEdit) -> int:
+    edit.post.title = iinput("post title", edit.post.title)
+    return OK
+
+
+@ecmds.new
+def description(edit: PostEdit) -> int:
+    edit.post.description = iinput("post description", edit.post.description)
+    return OK
+
+
+@ecmds.new
+def content(edit: PostEdit) -> int:
+    """edit posts"""
+
+    log("getting post markdown path")
+    path: str = get_tmpfile(edit.slug)
+
+    log("writing content")
+    with open(path, "w") as p:
+        p.write(edit.post.content)
+
+    open_file(edit.editor, path)
+
+    if not (content := read_post(path)):
+        return err("post content cannot be empty")
+
+    edit.post.content = content
+
+    return OK
+
+
+@ecmds.new
+def keywords(edit: PostEdit) -> int:
+    """edit keywords"""
+
+    edit.post.keywords = tuple(
+        map(
+            lambda k: unidecode(k.strip()),
+            filter(
+                bool,
+                set(
+                    iinput("post keywords", ", ".join(edit.post.keywords), force=False)
+                    .lower()
+                    .split(",")
+                ),
+            ),
+        )
+    )
+    return OK
+
+
+# normal commands
+
+
+@cmds.new
+@streamed
+def help(_: Config) -> int:
+    """print help"""
+
+    return llog(
+        "\n\n"
+        + "\n".join(
+            f"{cmd} -- {fn.__doc__ or 'no help provided'}"
+            for cmd, fn in cmds.commands.items()
+        )
+    )
+
+
+@cmds.new
+def sort(config: Config) -> int:
+    """sort blog posts by creation time"""
+
+    touch()  # posts are always kept in order, saving them sorts the file
+
+    return lnew("sorted blog posts by creation time")
+
+
+@cmds.new
+def new(config: Config) -> int:
+    """create a new blog post"""
+
+    title: str = iinput("post title")
+
+    log("creating a slug from the given title")
+    slug: str = slugify(
+        title,
+        derived.context_words,
+        derived.wslug_limit,
+        derived.slug_limit,
+    )
+
+    if slug in (posts := config["posts"]):
+        slug += f"-{len(posts.with_prefix(slug))}"
+
+    log("getting post markdown path")
+    post_path: str = get_tmpfile(slug)
+
+    open_file(config["editor"], post_path)
+
+    if not (content := read_post(post_path)):
+        return err("content cannot be empty")
+
+    keywords: tuple[str, ...] = tuple(
+        map(
+            lambda k: unidecode(k.strip()),
+            filter(
+                bool,
+                set(
+                    iinput("post keywords ( separated by `,` )", force=False)
+                    .lower()
+                    .split(",")
+                ),
+            ),
+        )
+    )
+
+    description: str = iinput("post description")
+
+    lnew(f"saving blog post {slug!r}")
+
+    posts[slug] = Post(
+        title,
+        description.strip(),
+        content,
+        keywords,
+        datetime.datetime.utcnow().timestamp(),
+    )
+
+    touch(slug)
+
+    return OK
+
+
+@cmds.new
+@streamed
+def ls(config: Config) -> int:
+    """list all posts, oldest first, `--keyword` and `--date YYYY[-MM]` filter them"""
+
+    when: typing.Tuple[int, int | None] | None = None
+    created: typing.Tuple[float, float] | None = None
+
+    if (keyword := cli_arg("--keyword")) is not None:
+        keyword = unidecode(keyword.strip().lower())
+
+    if (date := cli_arg("--date")) is not None:
+        match: re.Match[str] | None = DATE_RE.fullmatch(date)
+
+        if match is None or not datetime.MINYEAR <= int(match[1]) < datetime.MAXYEAR:
+            return err(f"--date should look like YYYY or YYYY-MM, not {date!r}")
+
+        when = int(match[1]), None if match[2] is None else int(match[2])
+        year, month = when
+        start: datetime.datetime = datetime.datetime(
+            year, month or 1, 1, tzinfo=datetime.timezone.utc
+        )
+        end: datetime.datetime = (
+            start.replace(year=year + 1)
+            if month is None
+            else (start + datetime.timedelta(days=31)).replace(day=1)
+        )
+        created = start.timestamp(), end.timestamp()
+
+    # the store may look the posts up itself, otherwise they are filtered here
 
-    t: Thread
+    selected: typing.Iterable[typing.Tuple[str, Post]] | None = None
 
-    blog_title: str = html_escape(config["title"])
-    author: str = html_escape(config["author"])
-    styles: str = f"{config['assets-dir']}/styles.min.css"
-    lang: str = config["locale"][:2]
+    if keyword is not None or created is not None:
+        selected = store.select(keyword, created)
 
-    crit_css: str = ""
-    post_crit_css: str = ""
+    # the oldest post is stored last, so only previews are kept until then
 
-    if os.path.isfile(critp := f"{config['assets-dir']}/critical.css"):
-        with open(critp, "r") as fp:
-            crit_css = web_mini.css.minify_css(fp.read())
+    previews: typing.Dict[str, Post] = {}
 
-    if os.path.isfile(critp := f"{config['assets-dir']}/post_critical.css"):
-        with open(critp, "r") as fp:
-            post_crit_css = web_mini.css.minify_css(fp.read())
+    for slug, post in config["posts"] if selected is None else selected:
+        post.content = trunc(post.content, config["post-preview-size"])
+        previews[slug] = post
 
-    rt: typing.List[int] = []
-    cc: typing.List[int] = []
-    ws: Counter[str] = Counter()
-    tgs: Counter[str] = Counter()
+    posts: PostStore = PostStore(previews)
+    slugs: typing.Set[str] | None = None
 
-    py: Counter[int] = Counter()
-    pm: Counter[int] = Counter()
-    pd: Counter[int] = Counter()
-    ph: Counter[int] = Counter()
+    if keyword is not None:
+        slugs = posts.by_keyword(keyword)
 
-    def build_post(slug: str, post: dict[str, typing.Any]) -> None:
-        ct: float = ctimer()
+    if when is not None:
+        dated: typing.Set[str] = posts.by_date(*when)
+        slugs = dated if slugs is None else slugs & dated
 
-        post_dir: str = f"{config['posts-dir']}/{slug}"
-        os.makedirs(post_dir)
-
-        rtm: MarkdownResult = read_time_of_markdown(post["content"], config["read-wpm"])
-        cont: str = post["content"] + " " + post["title"]
-
-        rt.append(rtm.seconds)
-        cc.append(len(cont))
-        ws.update(Counter(cont.split()))
-        tgs.update(Counter(post["keywords"]))
-
-        dt, s = rf_format_time(post["created"])
-
-        py[dt.year] += 1
-        pm[dt.month] += 1
-        pd[dt.day] += 1
-        ph[dt.hour] += 1
-
-        with open(f"{post_dir}/index.html", "w") as html:
-            html.write(
-                web_mini.html.minify_html(
-                    POST_TEMPLATE.format(
-                        lang=lang,
-                        keywords=html_escape(
-                            ", ".join(
-                                set(post["keywords"] + config["default-keywords"])
-                            )
-                        ),
-                        theme_type=config["theme"]["type"],
-                        theme_primary=config["theme"]["primary"],
-                        theme_secondary=config["theme"]["secondary"],
-                        styles=styles,
-                        critical_css=crit_css,
-                        post_critical_css=post_crit_css,
-                        gen=GEN,
-                        rss=config["rss-file"],
-                        blog_title=blog_title,
-                        post_title=html_escape(post["title"]),
-                        author=author,
-                        locale=config["locale"],
-                        post_creation_time=s,
-                        post_description=html_escape(post["description"]),
-                        post_read_time=rtm.text,
-                        post_edit_time=(
-                            ""
-                            if "edited" not in post
-                            else f', edited on <time>{rformat_time(post["edited"])}</time> GMT'
-                        ),
-                        visitor_count=config["visitor-count"],
-                        comment=config["comment"],
-                        website=config["website"],
-                        source=config["source"],
-                        post_content=markdown(
-                            post["content"], config["markdown-plugins"]
-                        ),
-                        blog=config["blog"],
-                        path=f"{config['posts-dir']}/{slug}",
-                        license=config["license"],
-                        email=config["email"],
-                    ),
-                )
-            )
+    for slug in reversed(posts if slugs is None else posts.ordered(slugs)):
+        post: Post = posts[slug]
 
-        lnew(f"built post {post['title']!r} in {ctimer() - ct} s")
-
-    ts: list[Thread] = []
-
-    for slug, post in tuple(config["posts"].items()):
-        ts.append(t := Thread(target=build_post, args=(slug, post), daemon=True))
-        t.start()
-
-    latest_post: tuple[str, dict[str, typing.Any]] = tuple(config["posts"].items())[0]
-
-    with open("index.html", "w") as index:
-        index.write(
-            web_mini.html.minify_html(
-                INDEX_TEMPLATE.format(  # type: ignore
-                    lang=lang,
-                    keywords=(bkw := html_escape(", ".join(config["blog-keywords"]))),
-                    theme_type=config["theme"]["type"],
-                    theme_primary=config["theme"]["primary"],
-                    theme_secondary=config["theme"]["secondary"],
-                    blog=config["blog"],
-                    path="",
-                    styles=styles,
-                    critical_css=crit_css,
-                    gen=GEN,
-                    rss=config["rss-file"],
-                    blog_title=blog_title,
-                    author=author,
-                    locale=config["locale"],
-                    license=config["license"],
-                    blog_description=(bd := html_escape(config["description"])),
-                    blog_header=(bh := html_escape(config["header"])),
-                    latest_post_path=f"{config['posts-dir']}/{latest_post[0]}",
-                    latest_post_title_trunc=html_escape(
-                        trunc(latest_post[1]["title"], config["recent-title-trunc"])
-                    ),
-                    latest_post_creation_time=rformat_time(latest_post[1]["created"]),
-                    visitor_count=config["visitor-count"],
-                    comment=config["comment"],
-                    website=config["website"],
-                    source=config["source"],
-                    blog_list=" ".join(
-                        f'<li><a href="/{config["posts-dir"]}/{slug}">{html_escape(post["title"])}</a></li>'
-                        for slug, post in config["posts"].items()
-                    ),
-                    email=config["email"],
-                ),
-            )
+        llog(
+            f"""post({slug})
+
+title : {post.title!r}
+description : {post.description!r}
+content : {post.content!r}
+keywords : {", ".join(post.keywords)}
+created : {format_time(post.created)}"""
+            + ("" if post.edited is None else f"\nedited : {format_time(post.edited)}")
         )
 
-        lnew(f"generated {index.name!r}")
-
-    for t in ts:
-        t.join()
-
-    char_count: int = sum(cc)
-    post_count: int = len(config["posts"])
-    epost_count: int = sum("edited" in p for p in config["posts"].values())
-
-    rts: int = sum(rt)
-
-    wcs: int = sum(ws.values())
-    wcl: int = len(ws)
-
-    tcs: int = sum(tgs.values())
-    tcl: int = len(tgs)
-
-    avg_chars: float = char_count / post_count
-    avg_words: float = wcs / post_count
-    avg_tags: float = tcs / post_count
-
-    with open("stats/index.html", "w") as stats:
-        stats.write(
-            web_mini.html.minify_html(
-                STATS_TEMPLATE.format(
-                    lang=lang,
-                    keywords=bkw + ", stats, statistics",
-                    theme_type=config["theme"]["type"],
-                    theme_primary=config["theme"]["primary"],
-                    theme_secondary=config["theme"]["secondary"],
-                    blog=config["blog"],
-                    path="stats",
-                    styles=styles,
-                    critical_css=crit_css,
-                    gen=GEN,
-                    locale=config["locale"],
-                    blog_title=blog_title,
-                    blog_description=bd,
-                    blog_header=bh,
-                    visitor_count=config["visitor-count"],
-                    comment=config["comment"],
-                    website=config["website"],
-                    source=config["source"],
-                    rss=config["rss-file"],
-                    post_count=post_count,
-                    edited_post_count=epost_count,
-                    edited_post_count_p=epost_count / post_count * 100,
-                    read_time=s_to_str(rts),
-                    avg_read_time=s_to_str(rts / post_count),
-                    char_count=char_count,
-                    avg_chars=avg_chars,
-                    word_count=wcs,
-                    avg_words=avg_words,
-                    avg_word_len=avg_chars / avg_words,
-                    top_words=config["top-words"],
-                    word_most_used=" ".join(
-                        f"<li><code>{html_escape(w)}</code>, <code>{u}</code> use{'' if u == 1 else 's'}, <code>{u / wcl * 100:.2f}%</code></li>"
-                        for w, u in ws.most_common(config["top-words"])
-                    ),
-                    tag_count=tcs,
-                    avg_tags=avg_tags,
-                    top_tags=config["top-tags"],
-                    tags_most_used=" ".join(
-                        f"<li><code>{html_escape(w)}</code>, <code>{u}</code> use{'' if u == 1 else 's'}, <code>{u / tcl * 100:.2f}%</code></li>"
-                        for w, u in tgs.most_common(config["top-tags"])
-                    ),
-                    default_tags=" ".join(
-                        f"<li><code>{html_escape(t)}</code></li>"
-                        for t in config["default-keywords"]
-                    ),
-                    **sorted_post_counter(py, post_count, "yr"),
-                    **sorted_post_counter(pm, post_count, "month"),
-                    **sorted_post_counter(pd, post_count, "day"),
-                    **sorted_post_counter(ph, post_count, "hr"),
-                    author=config["author"],
-                    email=config["email"],
-                    license=config["license"],
-                )
-            )
+    return OK
+
+
+@cmds.new
+def ed(config: Config) -> int:
+    """edit posts"""
+
+    fields: list[str] = select_multi(tuple(ecmds.commands.keys()))
+
+    for slug in select_posts(config["posts"]):
+        llog(f"editing {slug!r}")
+
+        for field in fields:
+            log(f"editing field {field!r}")
+
+            post: Post = config["posts"][slug]
+
+            if (code := ecmds[field](PostEdit(slug, post, config["editor"]))) is not OK:
+                return code
+
+            post.edited = datetime.datetime.utcnow().timestamp()
+            config["posts"][slug] = post  # reindex it
+            touch(slug)
+
+    return OK
+
+
+@cmds.new
+def rm(config: Config) -> int:
+    """remove posts"""
+
+    for slug in select_posts(config["posts"]):
+        imp(f"deleting {slug!r}")
+        del config["posts"][slug]
+        touch(slug)
+
+    return OK
+
+
+@cmds.new
+@staged
+def build(config: Config) -> int:
+    """build blog posts"""
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    import mistune
+    import web_mini
+
+    if not config["posts"]:
+        return err("no posts to be built")
+
+    if errors := markdown_errors(config["markdown-plugins"]):
+        for error in errors:
+            err(f"bad config : {error}")
+
+        return ER
+
+    log("setting up posts directory")
+
+    out: Output = output  # type: ignore
+
+    out.claim(config["posts-dir"])
+    out.claim("stats")
+
+    llog("building blog")
+
+    crit_css, post_crit_css = critical_css(config)
+
+    manifest_path: str = f"{config['cache-dir']}/manifest.json"
+    manifest: dict[str, typing.Any] = load_manifest(manifest_path, site="", posts={})
+
+    metrics_path: str = f"{config['cache-dir']}/metrics.json"
+    metrics: dict[str, typing.Any] = load_manifest(metrics_path, engine="", posts={})
+
+    page: Template = site_templates(config, derived, crit_css, post_crit_css)["post"]
+
+    site: str = hash_data(
+        GEN,
+        RENDERER_VERSION,
+        mistune.__version__,
+        web_mini.__version__,
+        page.literals,
+        page.fields,
+        *(config[key] for key in POST_CONFIG_KEYS),
+    )
+
+    if manifest["site"] != site:
+        log("site config or generator changed, rebuilding all posts")
+        manifest = {"version": __version__, "site": site, "posts": {}}
+
+    if metrics["engine"] != mistune.__version__:
+        metrics = {"version": __version__, "engine": mistune.__version__, "posts": {}}
+
+    built: dict[str, typing.Any] = {}
+    rebuilt: list[str] = []
+    texts: dict[str, typing.Any] = {}
+
+    stats: BuildStats = BuildStats(config["exact-words"], config["top-words-error"])
+
+    worker_args: typing.Tuple[typing.Any, ...] = (
+        {k: v for k, v in config.items() if k != "posts"},
+        derived,
+        crit_css,
+        post_crit_css,
+        site,
+        out.root,
+        metrics["posts"],
+        "--verify-minify" in sys.argv,
+    )
+
+    log("compiling regex")
+    init_build_worker(*worker_args)
+
+    templates: typing.Dict[str, Template] = bctx["templates"]
+
+    latest_post: tuple[str, Post] = config["posts"].latest(1)[0]
+
+    out.write(
+        "index.html",
+        render_page(
+            "index",
+            latest_post_path=f"{config['posts-dir']}/{latest_post[0]}",
+            latest_post_title_trunc=html_escape(
+                trunc(latest_post[1].title, config["recent-title-trunc"])
+            ),
+            latest_post_creation_time=rformat_time(latest_post[1].created),
+            blog_list=" ".join(
+                f'<li><a href="/{config["posts-dir"]}/{slug}">{html_escape(post.title)}</a></li>'
+                for slug, post in config["posts"].items()
+            ),
+        ),
+    )
+
+    lnew("generated 'index.html'")
+
+    slugs: typing.Tuple[str, ...] = tuple(config["posts"])
+    size: int
+    executor: Executor
+
+    if (jobs := cli_int("--jobs")) is None:
+        size = worker_count(config)
+        executor = ThreadPoolExecutor(max_workers=size)
+        log(f"building posts in {size} thread(s)")
+    else:
+        size = jobs
+        executor = ProcessPoolExecutor(
+            max_workers=size,
+            initializer=init_build_worker,
+            initargs=worker_args,
         )
+        log(f"building posts in {size} process(es)")
+
+    with executor:
+        try:
+            for slug, entry, fresh, written, key, text in pmap(
+                executor,
+                build_post,
+                slugs,
+                (config["posts"][slug] for slug in slugs),
+                (manifest["posts"].get(slug) for slug in slugs),
+                limit=size * 2,
+            ):
+                built[slug] = entry
+                texts[key] = text._asdict()
+                stats.merge(
+                    BuildStats.of_post(config["posts"][slug], text, config["read-wpm"])
+                )
+                out.count(written)
+
+                if fresh:
+                    rebuilt.append(slug)
+        except Exception as e:
+            return err(f"failed to build posts : {e.__class__.__name__} {e}")
+
+    log(f"rebuilt {len(rebuilt)} post(s), {len(built) - len(rebuilt)} up to date")
 
-        lnew(f"generated {stats.name!r}")
+    count, freed = bctx["cache"].prune(
+        config["render-cache-size"], config["render-cache-age"]
+    )
+
+    if count:
+        log(f"evicted {count} render cache entrie(s), {freed} B")
+
+    manifest["posts"] = built
+    metrics["posts"] = texts
+
+    out.on_publish(lambda: save_manifest(manifest_path, manifest))
+    out.on_publish(lambda: save_manifest(metrics_path, metrics))
+
+    write_stats(out, config, stats, templates["stats"])
 
     return 0
 
 
 @cmds.new
-def css(config: dict[str, typing.Any]) -> int:
+@staged
+def stats(config: Config) -> int:
+    """generate the stats page from cached post metrics, only posts whose \
+content changed since they were last counted are parsed"""
+
+    if not config["posts"]:
+        return err("no posts to count")
+
+    metrics_path: str = f"{config['cache-dir']}/metrics.json"
+    metrics: dict[str, typing.Any] = load_manifest(metrics_path, engine="", posts={})
+
+    texts: dict[str, typing.Any] = {}
+    totals: BuildStats = BuildStats(config["exact-words"], config["top-words-error"])
+    parsed: int = 0
+
+    for post in config["posts"].values():
+        key: str = metrics_key(post.content, config["markdown-plugins"])
+        text: PostText
+
+        if (cached := metrics["posts"].get(key)) is not None:
+            text = PostText(**cached)
+        else:
+            if not parsed and (errors := markdown_errors(config["markdown-plugins"])):
+                for error in errors:
+                    err(f"bad config : {error}")
+
+                return ER
+
+            text = markdown(post.content, config["markdown-plugins"])[1]
+            parsed += 1
+
+        texts[key] = cached or text._asdict()
+        totals.merge(BuildStats.of_post(post, text, config["read-wpm"]))
+
+    log(f"parsed {parsed} post(s), {totals.posts - parsed} cached")
+
+    out: Output = output  # type: ignore
+    out.claim("stats")
+
+    write_stats(
+        out,
+        config,
+        totals,
+        site_templates(config, derived, *critical_css(config))["stats"],
+    )
+
+    if parsed or len(texts) != len(metrics["posts"]):
+        metrics["posts"] = texts
+        out.on_publish(lambda: save_manifest(metrics_path, metrics))
+
+    return OK
+
+
+@cmds.new
+@staged
+def css(config: Config) -> int:
     """build and minify css"""
 
-    t: Thread
-    ts: list[Thread] = []
+    from concurrent.futures import ThreadPoolExecutor
+
+    import web_mini
 
     log("compiling regex")
     web_mini.css.css_fns.compileall()
 
-    def _thread(c: typing.Callable[..., typing.Any], *args: str) -> None:
-        def _c() -> None:
-            ct: float = ctimer()
-            c(*args)
-            lnew(f"processed {args[0]!r} in {ctimer() - ct} s")
-
-        ts.append(t := Thread(target=_c, daemon=True))
-        t.start()
+    files: list[typing.Tuple[str, str]] = []
 
     if os.path.isfile(styles := f"{config['assets-dir']}/styles.css"):
         lnew(f"minifying {styles!r}")
-        _thread(min_css_file, styles, f"{config['assets-dir']}/styles.min.css")  # type: ignore
+        files.append((styles, derived.styles))
 
     if os.path.isdir(fonts := f"{config['assets-dir']}/fonts"):
         log(f"minifying fonts in {fonts!r}")
@@ -1179,41 +3676,55 @@ def css(config: dict[str, typing.Any]) -> int:
             if fcss.endswith(".min.css"):
                 continue
 
-            _thread(min_css_file, fcss, f"{os.path.splitext(fcss)[0]}.min.css")  # type: ignore
+            files.append((fcss, f"{os.path.splitext(fcss)[0]}.min.css"))
+
+    def _min(file: str, out: str) -> None:
+        ct: float = ctimer()
+        min_css_file(file, out)
+        lnew(f"processed {file!r} in {ctimer() - ct} s")
+
+    size: int = worker_count(config)
 
-    for t in ts:
-        t.join()
+    with ThreadPoolExecutor(max_workers=size) as executor:
+        try:
+            for _ in pmap(executor, _min, *zip(*files), limit=size * 2):
+                pass
+        except Exception as e:
+            return err(f"failed to minify css : {e.__class__.__name__} {e}")
 
     return OK
 
 
 @cmds.new
-def robots(config: dict[str, typing.Any]) -> int:
+@staged
+def robots(config: Config) -> int:
     """generate a robots.txt"""
 
     llog("generating robots")
 
-    with open("robots.txt", "w") as r:
-        r.write(
-            f"""User-agent: *
+    output.write(  # type: ignore
+        "robots.txt",
+        f"""User-agent: *
 Disallow: /{config["assets-dir"]}/*
 Allow: *
-Sitemap: {config["blog"]}/sitemap.xml"""
-        )
+Sitemap: {config["blog"]}/sitemap.xml""",
+    )
 
-        lnew(f"generated {r.name!r}")
+    lnew("generated 'robots.txt'")
 
     return OK
 
 
 @cmds.new
-def manifest(config: dict[str, typing.Any]) -> int:
+@staged
+def manifest(config: Config) -> int:
     """generate a manifest.json"""
 
     llog("generating a manifest")
 
-    with open("manifest.json", "w") as m:
-        json.dump(
+    output.write(  # type: ignore
+        "manifest.json",
+        json_dumps(
             {
                 "$schema": "https://json.schemastore.org/web-manifest-combined.json",
                 "short_name": config["header"],
@@ -1225,21 +3736,24 @@ def manifest(config: dict[str, typing.Any]) -> int:
                 "background_color": config["theme"]["secondary"],
                 **config["manifest"],
             },
-            m,
-        )
+        ),
+    )
 
-        lnew(f"generated {m.name!r}")
+    lnew("generated 'manifest.json'")
 
     return OK
 
 
 @cmds.new
-def sitemap(config: dict[str, typing.Any]) -> int:
+@staged
+def sitemap(config: Config) -> int:
     """generate a sitemap.xml"""
 
+    import xml.etree.ElementTree as etree
+
     llog("generating a sitemap")
 
-    now: float = datetime.datetime.utcnow().timestamp()
+    now: float = last_change(config["posts"])
 
     root: etree.Element = etree.Element("urlset")
     root.set("xmlns", "http://www.sitemaps.org/schemas/sitemap/0.9")
@@ -1258,24 +3772,32 @@ def sitemap(config: dict[str, typing.Any]) -> int:
             f"{config['blog']}/{config['posts-dir']}/{slug}" if slug else post
         )
         etree.SubElement(url, "lastmod").text = datetime.datetime.utcfromtimestamp(
-            post.get("edited", post["created"]) if slug else now  # type: ignore
+            post.changed if slug else now  # type: ignore
         ).strftime("%Y-%m-%dT%H:%M:%S+00:00")
         etree.SubElement(url, "priority").text = "1.0"
 
-    etree.ElementTree(root).write("sitemap.xml", encoding="UTF-8", xml_declaration=True)
+    output.write(  # type: ignore
+        "sitemap.xml",
+        etree.tostring(root, encoding="UTF-8", xml_declaration=True),
+    )
     lnew("generated 'sitemap.xml'")
 
     return OK
 
 
 @cmds.new
-def rss(config: dict[str, typing.Any]) -> int:
+@staged
+def rss(config: Config) -> int:
     """generate an rss feed"""
 
+    import xml.etree.ElementTree as etree
+
     llog("generating an rss feed")
 
     ftime: str = "%a, %d %b %Y %H:%M:%S GMT"
-    now: datetime.datetime = datetime.datetime.utcnow()
+    now: datetime.datetime = datetime.datetime.utcfromtimestamp(
+        last_change(config["posts"])
+    )
 
     root: etree.Element = etree.Element("rss")
     root.set("version", "2.0")
@@ -1286,34 +3808,33 @@ def rss(config: dict[str, typing.Any]) -> int:
     etree.SubElement(channel, "link").text = config["blog"]
     etree.SubElement(channel, "description").text = config["description"]
     etree.SubElement(channel, "generator").text = GEN
-    etree.SubElement(channel, "language").text = (
-        config["locale"].lower().replace("_", "-")
-    )
+    etree.SubElement(channel, "language").text = derived.language
     etree.SubElement(channel, "lastBuildDate").text = now.strftime(ftime)
 
     for slug, post in config["posts"].items():
         llog(f"adding {slug!r} to rss")
 
-        created: float | None = post.get("edited")
+        created: float | None = post.edited
 
         item: etree.Element = etree.SubElement(channel, "item")
 
-        etree.SubElement(item, "title").text = post["title"]
+        etree.SubElement(item, "title").text = post.title
         etree.SubElement(item, "link").text = (
             link := f"{config['blog']}/{config['posts-dir']}/{slug}"
         )
-        etree.SubElement(item, "description").text = post["description"] + (
+        etree.SubElement(item, "description").text = post.description + (
             f" [edited at {datetime.datetime.utcfromtimestamp(created).strftime(ftime)}]"
             if created
             else ""
         )
         etree.SubElement(item, "pubDate").text = datetime.datetime.utcfromtimestamp(
-            post["created"]
+            post.created
         ).strftime(ftime)
         etree.SubElement(item, "guid").text = link
 
-    etree.ElementTree(root).write(
-        config["rss-file"], encoding="UTF-8", xml_declaration=True
+    output.write(  # type: ignore
+        config["rss-file"],
+        etree.tostring(root, encoding="UTF-8", xml_declaration=True),
     )
 
     lnew(f"generated {config['rss-file']!r}")
@@ -1322,43 +3843,72 @@ def rss(config: dict[str, typing.Any]) -> int:
 
 
 @cmds.new
-def apis(config: dict[str, typing.Any]) -> int:
+@staged
+def apis(config: Config) -> int:
     """generate and hash apis"""
 
-    with open("recents.json", "w") as recents:
-        json.dump(
-            dict(
-                map(
-                    lambda kv: (  # type: ignore
-                        kv[0],
-                        {
-                            "title": kv[1]["title"],
-                            "content": trunc(
-                                kv[1]["content"], config["post-preview-size"], ""
-                            ),
-                            "created": kv[1]["created"],
-                        },
-                    ),
-                    tuple(config["posts"].items())[: config["recents"]],
-                )
-            ),
-            recents,
+    out: Output = output  # type: ignore
+
+    recents: bytes = json_dumps(
+        dict(
+            map(
+                lambda kv: (  # type: ignore
+                    kv[0],
+                    {
+                        "title": kv[1].title,
+                        "content": trunc(
+                            kv[1].content, config["post-preview-size"], ""
+                        ),
+                        "created": kv[1].created,
+                    },
+                ),
+                config["posts"].latest(config["recents"]),
+            )
         )
-        lnew(f"generated {recents.name!r}")
+    )
+
+    write_api(out, "recents.json", recents)
+    write_api(out, CONFIG_FILE, store.export(config))
+
+    return OK
 
-    for api in recents.name, CONFIG_FILE:
-        with open(api, "rb") as content:
-            h: str = hashlib.sha256(content.read()).hexdigest()
 
-        with open(f"{api.replace('.', '_')}_hash.txt", "w") as hf:
-            hf.write(h)
-            lnew(f"generated {hf.name!r}")
+@cmds.new
+def cache(config: Config) -> int:
+    """render cache stats or pruning -- cache [stats|prune]"""
+
+    rc: RenderCache = RenderCache(f"{config['cache-dir']}/render")
+    action: str = sys.argv[2] if len(sys.argv) > 2 else "stats"
+
+    if action == "stats":
+        entries: typing.List[typing.Tuple[float, int, str]] = rc.entries()
+        size: int = sum(e[1] for e in entries)
+        limit: int = config["render-cache-size"]
+
+        llog(
+            f"""render cache {rc.path!r}
+
+entries : {len(entries)}
+size : {size} B ( limit {limit} B{f", {size / limit * 100:.2f}%" if limit else ""} )"""
+            + (
+                f"""
+least recently used : {format_time(entries[0][0])}
+most recently used : {format_time(entries[-1][0])}"""
+                if entries
+                else ""
+            )
+        )
+    elif action == "prune":
+        count, freed = rc.prune(config["render-cache-size"], config["render-cache-age"])
+        lnew(f"evicted {count} entrie(s), freed {freed} B")
+    else:
+        return err(f"unknown cache action {action!r}, see `help`")
 
     return OK
 
 
 @cmds.new
-def clean(config: dict[str, typing.Any]) -> int:
+def clean(config: Config) -> int:
     """clean up the site"""
 
     def remove(file: str) -> None:
@@ -1382,6 +3932,13 @@ def clean(config: dict[str, typing.Any]) -> int:
         "robots.txt",
         "sitemap.xml",
         "stats",
+        "stats.json",
+        "stats_json_hash.txt",
+        *(
+            ()
+            if isinstance(store, JsonStore)
+            else (CONFIG_FILE, JsonStore(CONFIG_FILE).journal)
+        ),
     ):
         if os.path.exists(pattern):
             remove(pattern)
@@ -1393,12 +3950,13 @@ def clean(config: dict[str, typing.Any]) -> int:
 
 
 @cmds.new
-def static(config: dict[str, typing.Any]) -> int:
+@staged
+def static(config: Config) -> int:
     """generate a full static site"""
 
     ct: float = ctimer()
 
-    for stage in clean, build, css, robots, manifest, sitemap, rss, apis:
+    for stage in build, css, robots, manifest, sitemap, rss, apis:
         imp(f"running stage {stage.__name__!r} : {stage.__doc__ or stage.__name__!r}")
 
         st: float = ctimer()
@@ -1412,34 +3970,82 @@ def static(config: dict[str, typing.Any]) -> int:
 
 
 @cmds.new
-def serve(config: dict[str, typing.Any]) -> int:
-    """simple server"""
+@streamed
+def serve(config: Config) -> int:
+    """simple server, files are cached in memory and revalidated by the \
+browser with etags, `--no-cache` reads and sends every file on every request"""
+
+    import email.utils
+    import http.server
+
+    cache: FileCache | None = None if "--no-cache" in sys.argv else FileCache()
 
     class RequestHandler(http.server.SimpleHTTPRequestHandler):
         def log_message(self, format: str, *args: typing.Any) -> None:
             llog(format % args)
 
-        def do_GET(self) -> None:
+        def not_modified(self, file: ServedFile) -> bool:
+            if (tags := self.headers.get("If-None-Match")) is not None:
+                return tags.strip() == "*" or file.etag in (
+                    tag.strip() for tag in tags.replace("W/", "").split(",")
+                )
+
+            try:
+                since: datetime.datetime = email.utils.parsedate_to_datetime(
+                    self.headers["If-Modified-Since"]
+                )
+            except Exception:
+                return False
+
+            return file.mtime // 1000000000 <= since.timestamp()
+
+        def respond(self, body: bool) -> None:
             file_path: str = self.translate_path(self.path)  # type: ignore
 
             if os.path.isdir(file_path):  # type: ignore
                 file_path = f"{file_path}/index.html"
 
             try:
-                with open(file_path, "rb") as fp:  # type: ignore
-                    self.send_response(200)  # type: ignore
-                    self.send_header(
-                        "Cache-Control", "no-store, no-cache, must-revalidate"
-                    )
-                    self.send_header("Pragma", "no-cache")
-                    self.end_headers()  # type: ignore
-                    self.wfile.write(fp.read())  # type: ignore
+                file: ServedFile = (
+                    read_served(file_path) if cache is None else cache.get(file_path)
+                )
             except Exception as e:
                 self.send_response(404)  # type: ignore
                 self.send_header("Cache-Control", "no-store, no-cache, must-revalidate")
                 self.send_header("Pragma", "no-cache")
                 self.end_headers()  # type: ignore
                 self.wfile.write(f"{e.__class__.__name__} : {e}".encode())  # type: ignore
+                return
+
+            modified: bool = cache is None or not self.not_modified(file)
+
+            self.send_response(200 if modified else 304)  # type: ignore
+
+            if cache is None:
+                self.send_header("Cache-Control", "no-store, no-cache, must-revalidate")
+                self.send_header("Pragma", "no-cache")
+            else:
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("ETag", file.etag)
+                self.send_header(
+                    "Last-Modified",
+                    self.date_time_string(file.mtime // 1000000000),  # type: ignore
+                )
+
+            if modified:
+                self.send_header("Content-Type", self.guess_type(file_path))  # type: ignore
+                self.send_header("Content-Length", str(len(file.data)))
+
+            self.end_headers()  # type: ignore
+
+            if modified and body:
+                self.wfile.write(file.data)  # type: ignore
+
+        def do_GET(self) -> None:
+            self.respond(True)
+
+        def do_HEAD(self) -> None:
+            self.respond(False)
 
     httpd: typing.Any = http.server.HTTPServer(
         (config["server-host"], config["server-port"]), RequestHandler
@@ -1459,7 +4065,7 @@ def serve(config: dict[str, typing.Any]) -> int:
 
 
 @cmds.new
-def dev(config: dict[str, typing.Any]) -> int:
+def dev(config: Config) -> int:
     """generate a full static site + serve it"""
 
     if (code := static(config)) is not OK:
@@ -1469,11 +4075,110 @@ def dev(config: dict[str, typing.Any]) -> int:
 
 
 @cmds.new
-def blog(config: dict[str, typing.Any]) -> int:
+def compact(config: Config) -> int:
+    """fold the edit journal into the blog"""
+
+    if not isinstance(store, JsonStore) or not os.path.exists(store.journal):
+        return lnew("nothing to compact")
+
+    touch()
+
+    return lnew(f"folding {store.journal!r} into {store.name!r}")
+
+
+@cmds.new
+@streamed
+def history(config: Config) -> int:
+    """list posts saved and removed since the blog was last compacted"""
+
+    if not isinstance(store, JsonStore):
+        return err(f"{store.name!r} keeps no edit journal")
+
+    for record in store.records():
+        llog(
+            f"{format_time(record['time'])} | {record['slug']} | "
+            + (
+                "removed"
+                if record["post"] is None
+                else f"saved {record['post']['title']!r}"
+            )
+        )
+
+    return OK
+
+
+@cmds.new
+def split(config: Config) -> int:
+    """split the blog into an index and per-post content files"""
+
+    global store
+
+    if isinstance(store, SplitStore):
+        return err(f"blog is already split into {store.name!r}")
+
+    store = SplitStore(STORE_DIR)
+    touch()
+
+    lnew(
+        f"blog will be saved to {store.name!r}, "
+        f"{CONFIG_FILE!r} is now generated by `apis`"
+    )
+
+    return OK
+
+
+@cmds.new
+def sqlite(config: Config) -> int:
+    """move the blog into a sqlite database"""
+
+    global store
+
+    if isinstance(store, SqliteStore):
+        return err(f"blog is already in {store.name!r}")
+
+    store = SqliteStore(DB_FILE)
+    touch()
+
+    lnew(
+        f"blog will be saved to {store.name!r}, "
+        f"{CONFIG_FILE!r} is now generated by `apis`"
+    )
+
+    return OK
+
+
+@cmds.new
+def search(config: Config) -> int:
+    """search posts, `search <words...>`"""
+
+    if len(sys.argv) < 3:
+        return err("nothing to search for")
+
+    for slug in store.search(config, " ".join(sys.argv[2:])):
+        llog(f"{slug} -- {config['posts'][slug].title}")
+
+    return OK
+
+
+@cmds.new
+@staged
+def export_json(config: Config) -> int:
+    """export the blog to a single json file, as served by the api"""
+
+    output.write(CONFIG_FILE, store.export(config))  # type: ignore
+    lnew(f"exported the blog to {CONFIG_FILE!r}")
+
+    return OK
+
+
+@cmds.new
+def blog(config: Config) -> int:
     """generate a new blog"""
 
     log("changing config")
     config.update(DEFAULT_CONFIG)
+    config["posts"] = PostStore()
+    touch()
     lnew("blog set to default values")
 
     return OK
@@ -1489,23 +4194,49 @@ def main() -> int:
     if len(sys.argv) < 2:
         return err("no arguments provided, see `help`")
 
-    cfg: dict[str, typing.Any] = DEFAULT_CONFIG.copy()
+    log(f"looking command {sys.argv[1]!r} up")
+
+    try:
+        cmd: typing.Callable[[Config], int] = cmds[sys.argv[1]]
+    except KeyError:
+        return err(f"command {sys.argv[1]!r} does not exist")
+
+    if errors := cli_errors():
+        for error in errors:
+            err(f"bad argument : {error}")
+
+        return ER
 
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as config:
-            log(f"using {config.name!r} config")
-            cfg.update(json.load(config))
+    global store
+
+    cfg: Config = DEFAULT_CONFIG.copy()
+    events: typing.Generator[BlogEvent, None, None] | None = None
+
+    if (store := open_store()).exists():
+        log(f"using {store.name!r} config")
+
+        if cmd in streaming:
+            stream_config(events := store.stream(), cfg)
+        else:
+            cfg.update(typing.cast(Config, store.load()))  # checked below
     else:
         lnew("using the default config")
 
-    sort(cfg)
+    if cmd not in streaming:
+        cfg["posts"] = PostStore(cfg["posts"])
+    elif isinstance(cfg["posts"], dict):
+        cfg["posts"] = iter(typing.cast(typing.Dict[str, Post], cfg["posts"]).items())
 
-    log(f"looking command {sys.argv[1]!r} up")
+    log("checking the config")
 
-    try:
-        cmd: typing.Callable[[dict[str, typing.Any]], int] = cmds[sys.argv[1]]
-    except KeyError:
-        return err(f"command {sys.argv[1]!r} does not exist")
+    if errors := config_errors(cfg):
+        for error in errors:
+            err(f"bad config : {error}")
+
+        return ER
+
+    global derived
+    derived = Derived.of(cfg)
 
     log("calling and timing the command")
     if NCI:
@@ -1514,14 +4245,20 @@ def main() -> int:
 
     code: int = cmd(cfg)
 
+    if events is not None:
+        events.close()  # streamed commands may stop before the last post
+
     if NCI:
         print()
         log(f"command finished in {ctimer() - timer} s")  # type: ignore
-        sort(cfg)
 
-    with open(CONFIG_FILE, "w") as config:
-        log(f"dumping config to {config.name!r}")
-        json.dump(cfg, config, indent=cfg["indent"] if NCI else None)
+    if changes:
+        log(f"dumping config to {store.name!r}")
+        store.save(
+            cfg,
+            cfg["indent"] if NCI else None,
+            None if None in changes else typing.cast(typing.Set[str], changes),
+        )
 
     log(f"goodbye world, return {code}, total {ctimer() - main_t} s")
 
@@ -3,9 +3,10 @@
 """migrates from v1 to v2"""
 
 
-import json
 from warnings import filterwarnings as filter_warnings
 
+from blog import json_dumps, json_loads
+
 
 def t(data: str) -> str:
     return data[:196] + ("" if len(data) < 196 else " ...")
@@ -14,11 +15,11 @@ def t(data: str) -> str:
 def main() -> int:
     """entry / main function"""
 
-    with open("a.json", "r") as f:  # old v1 blog
-        posts = json.load(f)["blogs"]
+    with open("a.json", "rb") as f:  # old v1 blog
+        posts = json_loads(f.read())["blogs"]
 
-    with open("blog.json", "r") as f:
-        blog = json.load(f)
+    with open("blog.json", "rb") as f:
+        blog = json_loads(f.read())
 
     for slug, post in posts.items():
         blog["posts"][slug] = {
@@ -29,8 +30,8 @@ def main() -> int:
             "created": post["time"],
         }
 
-    with open("blog.json", "w") as f:
-        json.dump(blog, f, indent=4)
+    with open("blog.json", "wb") as f:
+        f.write(json_dumps(blog, 4))
 
     return 0
 
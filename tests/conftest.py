@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""the blog manager is a script, not a package, so make it importable"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts"))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""minifying only the slots of a page must match minifying the whole page"""
+
+import random
+import typing
+
+import pytest
+
+import blog
+
+PAGE: typing.Final[str] = """<!doctype html>
+<html lang="en">
+    <head>
+        <!-- the head -->
+        <title>{title} -- blog</title>
+        <meta name="keywords" content="{keywords}" />
+    </head>
+    <body>
+        <main>
+            <h1 class="{cls}">{title}</h1>
+            <div id="content">{content}</div>
+            <p>built on <time>{time}</time></p>
+        </main>
+    </body>
+</html>"""
+
+PIECES: typing.Final[typing.Tuple[str, ...]] = (
+    "word",
+    "two words",
+    " ",
+    "  ",
+    "\n",
+    "\t",
+    "\xa0",
+    "<!-- comment -->",
+    "<p>",
+    "</p>",
+    "<b> bold </b>",
+    "<li>",
+    "</li>",
+    "<br />",
+    '<a href="https://example.com/" title="a link">',
+    "</a>",
+    '<img src="x.png" alt="x" />',
+    "<code> a  b </code>",
+    "<pre>\n  kept\n    as is\n</pre>",
+    "<textarea>  a\n</textarea>",
+    "<code>",
+    "</pre>",
+)
+
+
+def html_soup(rnd: random.Random) -> str:
+    return "".join(rnd.choices(PIECES, k=rnd.randint(0, 12)))
+
+
+def page_values(rnd: random.Random) -> typing.Dict[str, str]:
+    return {
+        "title": rnd.choice(("title", " a  title ", "&amp; title\n")),
+        "keywords": ", ".join(rnd.choices(("a", "b c", "d"), k=rnd.randint(0, 3))),
+        "cls": rnd.choice(("", "title", "a b", "  spaced  ")),
+        "content": html_soup(rnd),
+        "time": rnd.choice(("2022-01-01", " now ", "")),
+    }
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_minified_template(seed: int) -> None:
+    """slots filled in with raw html and with cached fragments"""
+
+    rnd: random.Random = random.Random(seed)
+    template: blog.Template = blog.Template(PAGE)
+    minified: blog.MinifiedTemplate = blog.MinifiedTemplate(template)
+
+    for _ in range(500):
+        values: typing.Dict[str, str] = page_values(rnd)
+        full: str = blog.minify_html(template.render(**values))
+
+        assert minified.render(**values) == full, values
+        assert (
+            minified.render(
+                **{**values, "content": blog.minified_fragment(values["content"])}
+            )
+            == full
+        ), values
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""stats folded from partials in any order must match counting sequentially"""
+
+from __future__ import annotations
+
+import datetime
+import random
+import typing
+from collections import Counter
+
+import pytest
+
+import blog
+
+WORDS: typing.Final[typing.Tuple[str, ...]] = tuple(f"w{idx}" for idx in range(60))
+TAGS: typing.Final[typing.Tuple[str, ...]] = ("a", "b", "c", "d", "e")
+
+
+def random_post(
+    rnd: random.Random,
+) -> typing.Tuple[blog.Post, blog.PostText]:
+    # few distinct words and tags, so there are plenty of ties
+    words: Counter[str] = Counter(rnd.choices(WORDS, k=rnd.randint(0, 40)))
+
+    return (
+        blog.Post(
+            rnd.choice(WORDS),
+            "",
+            "",
+            rnd.sample(TAGS, rnd.randint(0, 3)),
+            rnd.uniform(0, 2e9),
+            rnd.choice((None, rnd.uniform(0, 2e9))),
+        ),
+        blog.PostText(
+            dict(words),
+            sum(words.values()),
+            rnd.randint(0, 500),
+            rnd.randint(0, 4),
+        ),
+    )
+
+
+def fold(
+    stats: typing.Iterable[blog.BuildStats], exact_words: int | None = None
+) -> blog.BuildStats:
+    out: blog.BuildStats = blog.BuildStats(exact_words, 0.1)
+
+    for partial in stats:
+        out.merge(partial)
+
+    return out
+
+
+def counted(
+    posts: typing.List[typing.Tuple[blog.Post, blog.PostText]],
+) -> typing.Dict[str, Counter[typing.Any]]:
+    """the counters of `BuildStats`, counted one post after another"""
+
+    counts: typing.Dict[str, Counter[typing.Any]] = {
+        name: Counter()
+        for name in ("words", "tags", "years", "months", "days", "hours")
+    }
+
+    for post, text in posts:
+        dt: datetime.datetime = datetime.datetime.utcfromtimestamp(post.created)
+
+        counts["words"].update(text.words)
+        counts["words"].update(blog.plain_words(post.title))
+        counts["tags"].update(post.keywords)
+        counts["years"][dt.year] += 1
+        counts["months"][dt.month] += 1
+        counts["days"][dt.day] += 1
+        counts["hours"][dt.hour] += 1
+
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_merge_partials(seed: int) -> None:
+    """posts split into partials, shuffled and merged"""
+
+    rnd: random.Random = random.Random(seed)
+    posts: typing.List[typing.Tuple[blog.Post, blog.PostText]] = [
+        random_post(rnd) for _ in range(rnd.randint(1, 60))
+    ]
+    stats: typing.List[blog.BuildStats] = [
+        blog.BuildStats.of_post(post, text, 200) for post, text in posts
+    ]
+
+    sequential: blog.BuildStats = fold(stats)
+
+    rnd.shuffle(stats)
+    cuts: typing.List[int] = [
+        *sorted(
+            rnd.sample(range(1, len(stats)), min(len(stats) - 1, rnd.randint(0, 5)))
+        ),
+        len(stats),
+    ]
+    partials: typing.List[blog.BuildStats] = [
+        fold(stats[start:end]) for start, end in zip([0, *cuts], cuts)
+    ]
+    rnd.shuffle(partials)
+
+    merged: blog.BuildStats = fold(partials)
+
+    for name, counter in counted(posts).items():
+        assert getattr(merged, name) == counter, name
+        assert blog.most_common(getattr(merged, name)) == blog.most_common(
+            counter
+        ), name
+
+    assert merged.posts == len(posts)
+    assert merged.word_count == sum(merged.words.values())
+    assert merged.to_json(blog.DEFAULT_CONFIG) == sequential.to_json(
+        blog.DEFAULT_CONFIG
+    )
+
+
+def test_top_words_bounds() -> None:
+    """once words are no longer counted exactly, every kept count is at \
+most `error` over the real one"""
+
+    rnd: random.Random = random.Random(0)
+    posts: typing.List[blog.BuildStats] = [
+        blog.BuildStats.of_post(post, text, 200)
+        for post, text in (random_post(rnd) for _ in range(300))
+    ]
+
+    exact: blog.BuildStats = fold(posts)
+    top: blog.BuildStats = fold(posts, 20)
+
+    assert top.top is not None and len(top.top.counts) <= 10
+    assert top.word_count == exact.word_count
+
+    for word, uses in top.top.counts.items():
+        assert exact.words[word] <= uses <= exact.words[word] + top.top.error